@@ -0,0 +1,218 @@
+import atexit
+import os
+import time
+
+# Включение без флага: CG_TRACE=1 (трасса в trace.json) или CG_TRACE=путь.json
+TRACE_ENV = 'CG_TRACE'
+DEFAULT_TRACE = 'trace.json'
+MAX_EVENTS = 200000
+LATENCY_SAMPLES = 256
+OVERLAY_MS = 500
+OVERLAY_ROWS = 8
+# Отдельная "нить" в трассе для интервалов событие -> отрисовка
+LATENCY_TID = 0
+
+_tracer = None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    # Интервалы (имя, начало, конец) в формате Chrome trace events и
+    # сводка по именам: число, сумма, максимум. Нужные для этого модули
+    # грузятся только при включении - импорт приложения остаётся лёгким
+    def __init__(self, path=None):
+        import threading
+        from collections import deque
+        self.path = path
+        self.t0 = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.stats = {}
+        self.latency = deque(maxlen=LATENCY_SAMPLES)
+        # Последние значения счётчиков по именам
+        self.counters = {}
+        self.threads = {}
+        self.lock = threading.Lock()
+        self.current_thread = threading.current_thread
+        # Первое ещё не отрисованное событие (вид, время) и ожидание отрисовки
+        self.pending = None
+        self.paint_job = None
+
+    def _us(self, t):
+        return round((t - self.t0) * 1e6, 1)
+
+    def _add(self, name, start, end, tid, cat, args):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': self._us(start),
+                 'dur': round((end - start) * 1e6, 1), 'pid': self.pid, 'tid': tid}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+        with self.lock:
+            st = self.stats.get(name)
+            if st is None:
+                st = self.stats[name] = [0, 0.0, 0.0]
+            st[0] += 1
+            st[1] += end - start
+            st[2] = max(st[2], end - start)
+
+    def record(self, name, start, end, args=None):
+        thread = self.current_thread()
+        self.threads.setdefault(thread.ident, thread.name)
+        self._add(name, start, end, thread.ident, 'span', args)
+
+    def counter(self, name, values):
+        # Счётчики (ph: C) в трассе рисуются графиком; последние - в сводке
+        self.events.append({'name': name, 'ph': 'C', 'ts': self._us(time.perf_counter()),
+                            'pid': self.pid, 'args': dict(values)})
+        self.counters[name] = values
+
+    def event(self, kind):
+        # Несколько событий до одной отрисовки сливаются: задержка
+        # считается от самого раннего
+        if self.pending is None:
+            self.pending = (kind, time.perf_counter())
+
+    def painted(self, root):
+        # Tk рисует холсты в idle-обработчиках; after_idle, поставленный
+        # после изменения холста, выполнится уже после отрисовки
+        if self.pending is not None and self.paint_job is None:
+            self.paint_job = root.after_idle(self._painted)
+
+    def _painted(self):
+        self.paint_job = None
+        if self.pending is None:
+            return
+        (kind, start), self.pending = self.pending, None
+        end = time.perf_counter()
+        self.latency.append(end - start)
+        self._add(f'event to paint: {kind}', start, end, LATENCY_TID, 'latency', None)
+
+    def summary(self):
+        with self.lock:
+            rows = sorted(self.stats.items(), key=lambda kv: kv[1][1], reverse=True)
+        lines = []
+        if self.latency:
+            lat = sorted(self.latency)
+            lines.append(f'event->paint p50 {lat[len(lat) // 2] * 1e3:.1f} ms, '
+                         f'p95 {lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1e3:.1f} ms')
+        for name, values in list(self.counters.items()):
+            lines.append(f'{name}: ' + ', '.join(f'{k} {v}' for k, v in values.items()))
+        if rows:
+            lines.append(f'{"span":<24} {"n":>5} {"avg ms":>7} {"max ms":>7}')
+        for name, (n, total, worst) in rows[:OVERLAY_ROWS]:
+            lines.append(f'{name[:24]:<24} {n:>5} {total / n * 1e3:7.2f} {worst * 1e3:7.2f}')
+        return '\n'.join(lines)
+
+    def export(self, path=None):
+        path = path or self.path
+        if not path:
+            return None
+        import json
+        meta = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                for tid, name in list(self.threads.items())]
+        meta.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': LATENCY_TID,
+                     'args': {'name': 'event to paint'}})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': meta + list(self.events), 'displayTimeUnit': 'ms'}, f)
+        return path
+
+
+class Overlay:
+    # Сводка поверх окна, в правом верхнем углу; F2 - скрыть/показать
+    def __init__(self, tk, root, tracer):
+        self.root = root
+        self.tracer = tracer
+        self.visible = True
+        self.label = tk.Label(root, text='', justify='left', anchor='nw', font='TkFixedFont',
+                              bg='#222', fg='#ddd')
+        self.label.place(relx=1.0, y=0, anchor='ne')
+        root.bind('<F2>', self.toggle)
+        self.refresh()
+
+    def toggle(self, event=None):
+        self.visible = not self.visible
+        if self.visible:
+            self.label.place(relx=1.0, y=0, anchor='ne')
+        else:
+            self.label.place_forget()
+
+    def refresh(self):
+        if self.visible:
+            self.label.config(text=self.tracer.summary() or 'no spans yet')
+        self.root.after(OVERLAY_MS, self.refresh)
+
+
+def add_argument(ap):
+    ap.add_argument('--trace', nargs='?', const=DEFAULT_TRACE, metavar='FILE',
+                    help=f'time operations, show a stats overlay and write a Chrome trace on exit '
+                         f'(default file: {DEFAULT_TRACE}; also ${TRACE_ENV})')
+
+
+def enable(path=None):
+    # path=None - по переменной окружения; без неё трассировка выключена
+    global _tracer
+    if path is None:
+        path = os.environ.get(TRACE_ENV)
+        if not path or path == '0':
+            return None
+        if path == '1':
+            path = DEFAULT_TRACE
+    if _tracer is None:
+        _tracer = Tracer(path)
+        atexit.register(_tracer.export)
+    return _tracer
+
+
+def span(name, **args):
+    # Выключено - один общий пустой контекст, без замеров времени
+    if _tracer is None:
+        return _NULL
+    return _Span(_tracer, name, args)
+
+
+def event(kind):
+    if _tracer is not None:
+        _tracer.event(kind)
+
+
+def counter(name, values):
+    if _tracer is not None:
+        _tracer.counter(name, values)
+
+
+def painted(root):
+    if _tracer is not None:
+        _tracer.painted(root)
+
+
+def overlay(tk, root):
+    if _tracer is not None:
+        return Overlay(tk, root, _tracer)
+    return None
@@ -0,0 +1,177 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+import colors
+import color_arrays
+
+FUNCS = ('rgb_to_cmyk', 'cmyk_to_rgb', 'rgb_to_hsv_deg', 'hsv_deg_to_rgb')
+
+
+def scalar_backend():
+    def wrap(func):
+        return lambda arr: np.array([func(*map(float, row)) for row in arr.reshape(-1, arr.shape[-1])])
+    return {name: wrap(getattr(colors, name)) for name in FUNCS}
+
+
+def batch_backend():
+    return {name: getattr(color_arrays, name + '_array') for name in FUNCS}
+
+
+def lut_backend():
+    # Таблицы только для RGB -> CMYK/HSV; обратно формула быстрее и точнее
+    # сетки GridLut (см. bench_lut.py --grid)
+    from color_lut import RgbLut
+    cmyk, hsv = RgbLut('cmyk').load(), RgbLut('hsv').load()
+    return {
+        'rgb_to_cmyk': cmyk.lookup,
+        'rgb_to_hsv_deg': hsv.lookup,
+        'cmyk_to_rgb': color_arrays.cmyk_to_rgb_array,
+        'hsv_deg_to_rgb': color_arrays.hsv_deg_to_rgb_array,
+    }
+
+
+BACKENDS = {'scalar': scalar_backend, 'batch': batch_backend, 'lut': lut_backend}
+
+
+def all_rgb():
+    idx = np.arange(1 << 24, dtype=np.uint32)
+    return np.stack([idx >> 16, (idx >> 8) & 255, idx & 255], axis=-1).astype(np.uint8)
+
+
+def stratified_rgb(n, rng, strata=16):
+    # Равное число точек в каждой из strata^3 подкубов + все углы куба
+    per = max(1, n // strata**3)
+    step = 256 // strata
+    base = np.stack(np.meshgrid(*[np.arange(strata) * step] * 3, indexing='ij'), axis=-1).reshape(-1, 1, 3)
+    pts = (base + rng.integers(0, step, (base.shape[0], per, 3))).reshape(-1, 3)
+    corners = np.array([[r, g, b] for r in (0, 255) for g in (0, 255) for b in (0, 255)])
+    return np.concatenate([corners, pts]).astype(np.uint8)
+
+
+def throughput(func, arg, min_time=0.2):
+    func(arg[:16])
+    runs, t0 = 0, time.perf_counter()
+    while True:
+        func(arg)
+        runs += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            return runs * len(arg) / elapsed
+
+
+def roundtrip(forward, backward, rgb, worst):
+    # Ошибка RGB -> X -> RGB по каналам, в единицах 0..255
+    back = np.asarray(backward(np.asarray(forward(rgb), dtype=np.float64)), dtype=np.int64).reshape(rgb.shape)
+    err = np.abs(back - rgb.astype(np.int64)).max(axis=-1)
+    order = np.argsort(-err, kind='stable')[:worst]
+    return {
+        'samples': int(len(rgb)),
+        'max_error': int(err.max()),
+        'mean_error': float(err.mean()),
+        'mismatched': int(np.count_nonzero(err)),
+        'worst': [{'rgb': rgb[i].tolist(), 'back': back[i].tolist(), 'error': int(err[i])}
+                  for i in order if err[i] > 0],
+    }
+
+
+def agreement(ref, got):
+    diff = np.abs(np.asarray(got, dtype=np.float64) - np.asarray(ref, dtype=np.float64))
+    return {'max_abs_diff': float(diff.max()), 'mismatched': int(np.count_nonzero(diff.max(axis=-1)))}
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    sample = stratified_rgb(args.sample, rng)
+    inputs = {
+        'rgb_to_cmyk': sample,
+        'rgb_to_hsv_deg': sample,
+        'cmyk_to_rgb': color_arrays.rgb_to_cmyk_array(sample),
+        'hsv_deg_to_rgb': color_arrays.rgb_to_hsv_deg_array(sample),
+    }
+    results = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'sample': int(len(sample)),
+            'full_sweep': args.full,
+        },
+        'throughput': {}, 'roundtrip': {}, 'agreement': {},
+    }
+    backends = {name: BACKENDS[name]() for name in args.backends}
+    scalar_out = {}
+    if 'scalar' in backends:
+        scalar_out = {name: backends['scalar'][name](inputs[name]) for name in FUNCS}
+
+    for bname, funcs in backends.items():
+        small = args.scalar_sample if bname == 'scalar' else len(sample)
+        results['throughput'][bname] = {name: throughput(funcs[name], inputs[name][:small]) for name in FUNCS}
+        if args.full and bname != 'scalar':
+            rgb = all_rgb()
+        else:
+            rgb = sample[:small]
+        results['roundtrip'][bname] = {
+            'cmyk': roundtrip(funcs['rgb_to_cmyk'], funcs['cmyk_to_rgb'], rgb, args.worst),
+            'hsv': roundtrip(funcs['rgb_to_hsv_deg'], funcs['hsv_deg_to_rgb'], rgb, args.worst),
+        }
+        if scalar_out and bname != 'scalar':
+            results['agreement'][bname] = {name: agreement(scalar_out[name], funcs[name](inputs[name]))
+                                           for name in FUNCS}
+    return results
+
+
+def print_results(results, previous=None):
+    prev_tp = (previous or {}).get('throughput', {})
+    print('throughput, Mpx/s' + ('  (vs previous)' if previous else ''))
+    for bname, funcs in results['throughput'].items():
+        for name, rate in funcs.items():
+            line = f'    {bname:<7} {name:<15} {rate / 1e6:10.3f}'
+            old = prev_tp.get(bname, {}).get(name)
+            if old:
+                line += f'   x{rate / old:5.2f}'
+            print(line)
+    print('round trip, max |error| in 0..255 units')
+    for bname, trips in results['roundtrip'].items():
+        for model, r in trips.items():
+            print(f'    {bname:<7} RGB->{model}->RGB  samples {r["samples"]:>9}  max {r["max_error"]}  '
+                  f'mean {r["mean_error"]:.5f}  mismatched {r["mismatched"]}')
+            for w in r['worst'][:3]:
+                print(f'        {w["rgb"]} -> {w["back"]}')
+    for bname, funcs in results['agreement'].items():
+        for name, a in funcs.items():
+            print(f'    {bname} vs scalar {name:<15} max diff {a["max_abs_diff"]:.6f}  mismatched {a["mismatched"]}')
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Throughput and round-trip accuracy of the lab1 conversions')
+    ap.add_argument('--backends', default='scalar,batch', help='comma separated: scalar, batch, lut')
+    ap.add_argument('--sample', type=int, default=200_000, help='stratified RGB sample size')
+    ap.add_argument('--scalar-sample', type=int, default=20_000, help='pixels used for the slow scalar backend')
+    ap.add_argument('--full', action='store_true', help='sweep all 2^24 RGB values for array backends')
+    ap.add_argument('--worst', type=int, default=10, help='worst cases kept per round trip')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--json', help='write results to this file')
+    ap.add_argument('--compare', help='previous results JSON to compare throughput with')
+    args = ap.parse_args()
+    args.backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    unknown = set(args.backends) - set(BACKENDS)
+    if unknown:
+        ap.error(f'unknown backend(s): {", ".join(sorted(unknown))}')
+
+    results = run(args)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
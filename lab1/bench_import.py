@@ -0,0 +1,66 @@
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Модули, которые не должны попадать в импорт headless-ядра
+FORBIDDEN = {
+    'colors': ('tkinter', '_tkinter', 'numpy'),
+    'main': ('tkinter', '_tkinter', 'numpy'),
+}
+
+
+def import_profile(module):
+    # Возвращает записи -X importtime, относящиеся только к импорту module
+    # (без модулей, загруженных при старте интерпретатора)
+    # Общий instrument - из корня репозитория, как при запуске main.py
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(HERE), os.environ.get('PYTHONPATH')])))
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                         cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    block = []
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name[1:].rstrip()
+        block.append((name.strip(), int(self_us), int(cumulative_us)))
+        if not name.startswith(' '):
+            if name == module:
+                return block
+            block = []
+    raise RuntimeError(f'{module} not found in -X importtime output')
+
+
+def summarize(module, repeat):
+    best = min((import_profile(module) for _ in range(repeat)), key=lambda entries: entries[-1][2])
+    return best, {name for name, _, _ in best}, best[-1][2]
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Import-time benchmark for the lab1 modules (python -X importtime)')
+    ap.add_argument('modules', nargs='*', default=['colors', 'main', 'color_arrays'])
+    ap.add_argument('--repeat', type=int, default=5, help='take the fastest of N fresh interpreters')
+    ap.add_argument('--top', type=int, default=8)
+    ap.add_argument('--budget-ms', type=float, default=None, help='fail if an import takes longer')
+    args = ap.parse_args()
+
+    failed = False
+    for module in args.modules:
+        best, imported, total_us = summarize(module, args.repeat)
+        print(f'{module}: {total_us / 1000:.2f} ms, {len(imported)} modules')
+        for name, self_us, cum_us in sorted(best, key=lambda e: -e[1])[:args.top]:
+            print(f'    {self_us / 1000:8.2f} ms self  {cum_us / 1000:8.2f} ms cum  {name}')
+        leaked = [name for name in FORBIDDEN.get(module, ()) if name in imported]
+        if leaked:
+            print(f'    FAIL: imports {", ".join(leaked)}')
+            failed = True
+        if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+            print(f'    FAIL: over budget of {args.budget_ms} ms')
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Общий модуль instrument лежит в корне репозитория
+sys.path.append(os.path.dirname(HERE))
+
+import instrument
+from instrument import span
+from colors import rgb_to_cmyk
+
+
+def bare(colors):
+    for c in colors:
+        rgb_to_cmyk(*c)
+
+
+def traced(colors):
+    # Как ColorApp.convert: каждое преобразование - отдельный интервал
+    for c in colors:
+        with span('rgb_to_cmyk'):
+            rgb_to_cmyk(*c)
+
+
+def best(fn, colors, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(colors)
+        times.append(time.perf_counter() - t0)
+    return min(times) / len(colors)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Cost of instrument.span on the per-conversion hot path')
+    ap.add_argument('--n', type=int, default=200000)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+    rnd = random.Random(1)
+    colors = [(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)) for _ in range(args.n)]
+
+    base = best(bare, colors, args.repeat)
+    off = best(traced, colors, args.repeat)
+    # Включение без файла: трасса только в памяти
+    instrument.enable('')
+    on = best(traced, colors, args.repeat)
+    print(f'rgb_to_cmyk x{args.n}, ns per call')
+    print(f'    bare              {base * 1e9:8.0f}')
+    print(f'    span, disabled    {off * 1e9:8.0f}  (+{(off - base) * 1e9:.0f})')
+    print(f'    span, enabled     {on * 1e9:8.0f}  (+{(on - base) * 1e9:.0f})')
+
+
+if __name__ == '__main__':
+    main()
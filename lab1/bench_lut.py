@@ -0,0 +1,53 @@
+import argparse
+import time
+import numpy as np
+from color_arrays import rgb_to_cmyk_array, rgb_to_hsv_deg_array, cmyk_to_rgb_array, hsv_deg_to_rgb_array
+from color_lut import LUT_DIR, RgbLut, GridLut
+
+
+def timed(func, arg):
+    t0 = time.perf_counter()
+    out = func(arg)
+    return out, time.perf_counter() - t0
+
+
+def report(name, direct, lut, n):
+    (ref, t_ref), (got, t_lut) = direct, lut
+    err = np.abs(got.astype(np.float64) - ref)
+    line = (f'{name:<10} direct {n / t_ref / 1e6:8.2f} Mpx/s   lut {n / t_lut / 1e6:8.2f} Mpx/s   '
+            f'x{t_ref / t_lut:6.1f}   max err {err.max():.6f}   mean err {err.mean():.6f}')
+    if ref.dtype == np.uint8:
+        line += f'   mismatch {np.count_nonzero(err.max(axis=-1)) / n:.4%}'
+    print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Accuracy and throughput of the lab1 color LUTs')
+    ap.add_argument('--samples', type=int, default=2_000_000)
+    ap.add_argument('--lut-dir', default=LUT_DIR, help="where tables are kept ('' - build in memory)")
+    ap.add_argument('--grid', action='store_true', help='also compare the experimental GridLut for cmyk/hsv -> rgb')
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+    rng = np.random.default_rng(args.seed)
+    n = args.samples
+
+    for kind, direct in (('cmyk', rgb_to_cmyk_array), ('hsv', rgb_to_hsv_deg_array)):
+        lut = RgbLut(kind, args.lut_dir)
+        t0 = time.perf_counter()
+        lut.load()
+        print(f'rgb->{kind} table ready in {time.perf_counter() - t0:.2f} s ({lut.path or "in memory"})')
+        rgb = rng.integers(0, 256, (n, 3), dtype=np.uint8)
+        lut.lookup(rgb[:1024])
+        report(f'rgb->{kind}', timed(direct, rgb), timed(lut.lookup, rgb), n)
+
+    if not args.grid:
+        return
+    cmyk = np.round(rng.uniform(0, 100, (n, 4)), 2)
+    hsv = np.column_stack([rng.uniform(0, 360, n), rng.uniform(0, 100, (n, 2))]).round(2)
+    for kind, direct, values in (('cmyk', cmyk_to_rgb_array, cmyk), ('hsv', hsv_deg_to_rgb_array, hsv)):
+        grid = GridLut(kind)
+        report(f'{kind}->rgb', timed(direct, values), timed(grid.lookup, values), n)
+
+
+if __name__ == '__main__':
+    main()
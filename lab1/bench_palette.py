@@ -0,0 +1,77 @@
+import argparse
+import time
+import numpy as np
+from colors import DEFAULT_PALETTE
+from palette_index import PaletteIndex, to_space
+
+
+def brute_force(palette_rgb, pixels, space, chunk=1 << 15):
+    points = to_space(palette_rgb, space)
+    out = np.empty(len(pixels), dtype=np.int32)
+    for i in range(0, len(pixels), chunk):
+        diff = to_space(pixels[i:i+chunk], space)[:, None, :] - points[None, :, :]
+        out[i:i+chunk] = np.argmin((diff * diff).sum(-1), axis=1)
+    return out
+
+
+def test_image(megapixels, rng):
+    # Плавные градиенты с шумом: похоже на фото, а не на белый шум
+    w = int(np.sqrt(megapixels * 1e6 * 3 / 2))
+    h = int(megapixels * 1e6 / w)
+    y = np.linspace(0, 1, h, dtype=np.float32)[:, None]
+    x = np.linspace(0, 1, w, dtype=np.float32)[None, :]
+    img = np.empty((h, w, 3), dtype=np.uint8)
+    for ch, (a, b) in enumerate(((255, 0), (0, 255), (128, 96))):
+        noise = rng.integers(-12, 13, (h, w), dtype=np.int16)
+        img[..., ch] = np.clip(a * x + b * y + noise * 1.0 + 64 * np.sin(7 * (x + ch) * (y + 1)), 0, 255)
+    return img
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Nearest-palette index vs brute force')
+    ap.add_argument('--megapixels', type=float, default=24.0)
+    ap.add_argument('--palette-size', type=int, default=60)
+    ap.add_argument('--brute-sample', type=float, default=2.0, help='megapixels checked by brute force')
+    ap.add_argument('--dither-megapixels', type=float, default=1.0)
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    palette = list(DEFAULT_PALETTE)
+    while len(palette) < args.palette_size:
+        palette.append('#%06X' % rng.integers(0, 1 << 24))
+    img = test_image(args.megapixels, rng)
+    pixels = img.reshape(-1, 3)
+    n = len(pixels)
+    sample = pixels[rng.choice(n, min(n, int(args.brute_sample * 1e6)), replace=False)]
+
+    for space in ('rgb', 'hsv'):
+        t0 = time.perf_counter()
+        index = PaletteIndex(palette[1:], space)
+        t_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        index.insert(0, palette[0])
+        t_insert = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        index.quantize(img)
+        t_index = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        ref = brute_force(index.palette_rgb(), sample, space)
+        t_brute = (time.perf_counter() - t0) * n / len(sample)
+        same = np.array_equal(index.nearest(sample), ref)
+
+        print(f'{space}: build {t_build:.2f} s, insert {t_insert * 1000:.1f} ms, '
+              f'max candidates {index.ncand.max()}, mean {index.ncand.mean():.2f}')
+        print(f'    {args.megapixels:g} MP: index {t_index:.2f} s ({n / t_index / 1e6:.1f} Mpx/s), '
+              f'brute force ~{t_brute:.1f} s (x{t_brute / t_index:.1f}), identical: {same}')
+
+        dh = int(np.sqrt(args.dither_megapixels * 1e6 * 2 / 3))
+        t0 = time.perf_counter()
+        index.quantize(img[:dh, :dh * 3 // 2], dither=True)
+        t_dither = time.perf_counter() - t0
+        print(f'    dither {args.dither_megapixels:g} MP: {t_dither:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
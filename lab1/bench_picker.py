@@ -0,0 +1,57 @@
+import argparse
+import time
+import numpy as np
+from color_arrays import hsv_deg_to_rgb_array
+from colors import hsv_deg_to_rgb
+from hsv_picker import PlaneCache, render_sv_plane, render_hue_ring, to_ppm
+
+
+def per_frame(func, frames):
+    t0 = time.perf_counter()
+    for i in range(frames):
+        func(i)
+    return (time.perf_counter() - t0) / frames
+
+
+def main():
+    ap = argparse.ArgumentParser(description='HSV picker rendering speed')
+    ap.add_argument('--size', type=int, default=512)
+    ap.add_argument('--frames', type=int, default=120)
+    args = ap.parse_args()
+    n = args.size
+    hues = np.linspace(0, 360, args.frames, endpoint=False) + 0.37
+
+    # Базовые варианты: покомпонентный colorsys и прямой пакетный вызов на всю плоскость
+    sv = np.stack(np.meshgrid(np.linspace(0, 100, n), np.linspace(100, 0, n)), axis=-1)
+    loop_rows = max(1, n // 32)
+    t_loop = per_frame(lambda i: [hsv_deg_to_rgb(hues[i], s, v) for s, v in sv[:loop_rows].reshape(-1, 2)], 3)
+    t_loop *= n / loop_rows
+    t_batch = per_frame(lambda i: hsv_deg_to_rgb_array(np.concatenate([np.full((n, n, 1), hues[i]), sv], axis=-1)), 10)
+    t_plane = per_frame(lambda i: render_sv_plane(hues[i], n), args.frames)
+    t_ppm = per_frame(lambda i: to_ppm(render_sv_plane(hues[i], n)), args.frames)
+    cache = PlaneCache()
+    for h in hues[:16]:
+        cache.get(h, n)
+    t_cached = per_frame(lambda i: cache.get(hues[i % 16], n), args.frames)
+    t_ring = per_frame(lambda i: render_hue_ring(n, n // 10), 5)
+
+    print(f'SV plane {n}x{n}:')
+    for name, t in (('colorsys loop', t_loop), ('batched, full grid', t_batch),
+                    ('batched row x V', t_plane), ('  + PPM encode', t_ppm), ('cache hit', t_cached)):
+        print(f'    {name:<20} {t * 1000:9.2f} ms/frame  {1 / t:9.1f} fps')
+    print(f'hue ring {n}x{n}: {t_ring * 1000:.2f} ms (once per size)')
+
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        print(f'PhotoImage upload skipped: {e}')
+        return
+    photo = tk.PhotoImage(width=n, height=n)
+    t_photo = per_frame(lambda i: photo.configure(data=to_ppm(render_sv_plane(hues[i], n)), format='PPM'), args.frames)
+    print(f'    {"render + PhotoImage":<20} {t_photo * 1000:9.2f} ms/frame  {1 / t_photo:9.1f} fps')
+    root.destroy()
+
+
+if __name__ == '__main__':
+    main()
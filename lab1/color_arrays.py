@@ -0,0 +1,134 @@
+import numpy as np
+
+# Пикселей на один проход: ограничивает размер временных float64-массивов
+CHUNK = 1 << 18
+
+
+def _chunked(arr, in_ch, out_ch, out_dtype, func, chunk=CHUNK):
+    arr = np.asarray(arr)
+    if arr.shape[-1:] != (in_ch,):
+        raise ValueError(f'Expected array of shape (..., {in_ch})')
+    flat = arr.reshape(-1, in_ch)
+    out = np.empty((flat.shape[0], out_ch), dtype=out_dtype)
+    for i in range(0, flat.shape[0], chunk):
+        block = flat[i:i+chunk].astype(np.float64)
+        out[i:i+chunk] = func(*(block[:, j] for j in range(in_ch)))
+    return out.reshape(arr.shape[:-1] + (out_ch,))
+
+
+def _round4(x):
+    # round(x, 4) как в Python: np.round совпадает с ним везде, кроме
+    # значений у самой границы половины; их досчитываем поштучно.
+    out = np.round(x, 4)
+    scaled = x * 1e4
+    tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if tie.any():
+        idx = np.nonzero(tie)
+        out[idx] = [round(float(v), 4) for v in x[idx]]
+    return out
+
+
+def _round_int(x):
+    # int(round(x)) - банковское округление, как np.rint
+    return np.clip(np.rint(x), 0, 255)
+
+
+def _rgb_to_cmyk(r, g, b):
+    r_p, g_p, b_p = r/255.0, g/255.0, b/255.0
+    k = 1 - np.maximum(np.maximum(r_p, g_p), b_p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = (1 - r_p - k) / (1 - k)
+        m = (1 - g_p - k) / (1 - k)
+        y = (1 - b_p - k) / (1 - k)
+    out = np.stack([_round4(c*100), _round4(m*100), _round4(y*100), _round4(k*100)], axis=-1)
+    black = (r == 0) & (g == 0) & (b == 0)
+    out[black] = (0.0, 0.0, 0.0, 100.0)
+    return out
+
+
+def _cmyk_to_rgb(c, m, y, k):
+    c_p = np.clip(c, 0, 100)/100.0
+    m_p = np.clip(m, 0, 100)/100.0
+    y_p = np.clip(y, 0, 100)/100.0
+    k_p = np.clip(k, 0, 100)/100.0
+    r = 255*(1 - c_p)*(1 - k_p)
+    g = 255*(1 - m_p)*(1 - k_p)
+    b = 255*(1 - y_p)*(1 - k_p)
+    return np.stack([_round_int(r), _round_int(g), _round_int(b)], axis=-1)
+
+
+def _rgb_to_hsv(r, g, b):
+    # Повторяет colorsys.rgb_to_hsv операция в операцию
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    rangec = maxc - minc
+    gray = rangec == 0
+    safe_range = np.where(gray, 1.0, rangec)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.where(gray, 0.0, rangec / maxc)
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+    return h, s, maxc
+
+
+def _rgb_to_hsv_deg(r, g, b):
+    h, s, v = _rgb_to_hsv(r/255.0, g/255.0, b/255.0)
+    return np.stack([_round4(h*360), _round4(s*100), _round4(v*100)], axis=-1)
+
+
+def _hsv_to_rgb(h, s, v):
+    # Повторяет colorsys.hsv_to_rgb, включая отсечение int() и i % 6
+    i = np.trunc(h*6.0)
+    f = (h*6.0) - i
+    p = v*(1.0 - s)
+    q = v*(1.0 - s*f)
+    t = v*(1.0 - s*(1.0-f))
+    i = i.astype(np.int64) % 6
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    gray = s == 0.0
+    return np.where(gray, v, r), np.where(gray, v, g), np.where(gray, v, b)
+
+
+def _hsv_deg_to_rgb(h, s, v):
+    h_p = (h % 360)/360.0
+    s_p = np.clip(s, 0, 100)/100.0
+    v_p = np.clip(v, 0, 100)/100.0
+    r, g, b = _hsv_to_rgb(h_p, s_p, v_p)
+    return np.stack([_round_int(r*255), _round_int(g*255), _round_int(b*255)], axis=-1)
+
+
+def rgb_to_cmyk_array(rgb, chunk=CHUNK):
+    return _chunked(rgb, 3, 4, np.float64, _rgb_to_cmyk, chunk)
+
+
+def cmyk_to_rgb_array(cmyk, chunk=CHUNK):
+    return _chunked(cmyk, 4, 3, np.uint8, _cmyk_to_rgb, chunk)
+
+
+def rgb_to_hsv_deg_array(rgb, chunk=CHUNK):
+    return _chunked(rgb, 3, 3, np.float64, _rgb_to_hsv_deg, chunk)
+
+
+def hsv_deg_to_rgb_array(hsv, chunk=CHUNK):
+    return _chunked(hsv, 3, 3, np.uint8, _hsv_deg_to_rgb, chunk)
+
+
+def hex_to_rgb_array(hexstrs):
+    arr = np.asarray(hexstrs, dtype=str)
+    parts = []
+    for hx in arr.ravel():
+        s = hx.lstrip('#')
+        if len(s) == 3:
+            s = ''.join([ch*2 for ch in s])
+        if len(s) != 6:
+            raise ValueError('Bad hex')
+        parts.append(s)
+    raw = bytes.fromhex(''.join(parts))
+    if len(raw) != 3 * len(parts):
+        raise ValueError('Bad hex')
+    return np.frombuffer(raw, dtype=np.uint8).reshape(arr.shape + (3,)).copy()
@@ -0,0 +1,129 @@
+import os
+import numpy as np
+from color_arrays import CHUNK, rgb_to_cmyk_array, rgb_to_hsv_deg_array, _hsv_to_rgb
+
+# Таблицы RGB -> CMYK/HSV сохраняются сюда при первом использовании:
+# 2^24 строк uint16, 128 МиБ для CMYK и 96 МиБ для HSV (~234 МБ вместе).
+# LAB1_LUT_DIR задаёт другой каталог; пустое значение - не писать на диск,
+# таблица строится в памяти при каждом запуске
+LUT_DIR = os.environ.get('LAB1_LUT_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'lab1-lut'))
+
+# Таблицы хранятся в uint16 с фиксированной точкой: значение = код / масштаб.
+# Шаг 100/65535 ~ 0.0015% для CMYK/S/V и 360/65535 ~ 0.0055° для H.
+RGB_TABLES = {
+    'cmyk': (rgb_to_cmyk_array, np.array([65535/100.0]*4)),
+    'hsv': (rgb_to_hsv_deg_array, np.array([65535/360.0, 65535/100.0, 65535/100.0])),
+}
+
+
+def rgb_index(rgb):
+    rgb = np.asarray(rgb).astype(np.uint32, copy=False)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+
+def build_rgb_table(kind, chunk=CHUNK):
+    func, scale = RGB_TABLES[kind]
+    table = np.empty((1 << 24, len(scale)), dtype=np.uint16)
+    for start in range(0, 1 << 24, chunk):
+        idx = np.arange(start, min(start + chunk, 1 << 24), dtype=np.uint32)
+        rgb = np.stack([idx >> 16, (idx >> 8) & 255, idx & 255], axis=-1)
+        table[start:start + len(idx)] = np.clip(np.rint(func(rgb) * scale), 0, 65535)
+    return table
+
+
+class RgbLut:
+    def __init__(self, kind, lut_dir=LUT_DIR):
+        if kind not in RGB_TABLES:
+            raise ValueError(f'Unknown table {kind!r}')
+        self.kind = kind
+        self.scale = RGB_TABLES[kind][1]
+        self.path = os.path.join(lut_dir, f'rgb_{kind}_u16.npy') if lut_dir else None
+        self.table = None
+
+    def load(self):
+        if self.table is None and self.path is None:
+            self.table = build_rgb_table(self.kind)
+        if self.table is None:
+            if not os.path.isfile(self.path):
+                self.save(build_rgb_table(self.kind))
+            self.table = np.load(self.path, mmap_mode='r')
+        return self
+
+    def save(self, table):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, table)
+        os.replace(tmp, self.path)
+
+    def lookup_raw(self, rgb):
+        self.load()
+        # Строка таблицы читается как одно значение: одна выборка на пиксель
+        # Индекс - хотя бы одномерный: у 0-мерного результата (один пиксель)
+        # нельзя сменить dtype через view
+        ch = self.table.shape[1]
+        rows = self.table.view(f'V{2 * ch}')[:, 0]
+        idx = np.atleast_1d(rgb_index(rgb))
+        return rows[idx].view(np.uint16).reshape(np.shape(rgb)[:-1] + (ch,))
+
+    def lookup(self, rgb):
+        # float32 достаточно: шаг таблицы на порядки крупнее его точности
+        return self.lookup_raw(rgb) * (1 / self.scale).astype(np.float32)
+
+
+def _multilinear(grid, coords):
+    # grid: (n0, ..., n{d-1}, ch), coords: (N, d) в единицах узлов сетки
+    d = coords.shape[1]
+    shape = np.array(grid.shape[:d])
+    strides = np.cumprod(np.r_[shape[1:], 1][::-1])[::-1]
+    flat = grid.reshape(-1, grid.shape[-1])
+    i0 = np.clip(coords.astype(np.intp), 0, shape - 2)
+    f = coords - i0
+    base = i0 @ strides
+    out = np.zeros((coords.shape[0], grid.shape[-1]))
+    for corner in range(1 << d):
+        bits = [(corner >> ax) & 1 for ax in range(d)]
+        w = np.prod([f[:, ax] if bit else 1 - f[:, ax] for ax, bit in enumerate(bits)], axis=0)
+        out += w[:, None] * flat[base + int(np.dot(bits, strides))]
+    return out
+
+
+class GridLut:
+    # Обратные преобразования на грубой сетке с мультилинейной интерполяцией:
+    # 4D для CMYK -> RGB и трилинейной для HSV -> RGB. Эксперимент, в
+    # преобразования не входит: по bench_lut.py --grid (2 млн значений)
+    # медленнее формулы из color_arrays примерно в 10 раз для CMYK -> RGB и
+    # в 3 раза для HSV -> RGB, а у HSV -> RGB ~0.02% результатов отличаются
+    # на 1 в младшем разряде.
+    def __init__(self, kind, nodes=None):
+        self.kind = kind
+        if kind == 'cmyk':
+            nodes = nodes or (9, 9, 9, 9)
+            axes = [np.linspace(0, 1, n) for n in nodes]
+            c, m, y, k = np.meshgrid(*axes, indexing='ij')
+            self.grid = 255 * np.stack([(1 - c)*(1 - k), (1 - m)*(1 - k), (1 - y)*(1 - k)], axis=-1)
+            self.ranges = np.array([100.0]*4)
+        elif kind == 'hsv':
+            # Узлы по H кратны 60°, чтобы границы секторов попадали на сетку
+            nodes = nodes or (37, 11, 11)
+            if (nodes[0] - 1) % 6:
+                raise ValueError('Hue nodes - 1 must be a multiple of 6')
+            axes = [np.linspace(0, 1, n) for n in nodes]
+            h, s, v = np.meshgrid(*axes, indexing='ij')
+            self.grid = 255 * np.stack(_hsv_to_rgb(h, s, v), axis=-1)
+            self.ranges = np.array([360.0, 100.0, 100.0])
+        else:
+            raise ValueError(f'Unknown table {kind!r}')
+        self.nodes = np.array(nodes)
+
+    def lookup(self, values, chunk=CHUNK):
+        values = np.asarray(values, dtype=np.float64)
+        flat = values.reshape(-1, len(self.nodes))
+        out = np.empty((flat.shape[0], 3), dtype=np.uint8)
+        for i in range(0, flat.shape[0], chunk):
+            block = flat[i:i+chunk]
+            if self.kind == 'hsv':
+                block = np.column_stack([block[:, 0] % 360, block[:, 1:]])
+            coords = np.clip(block, 0, self.ranges) / self.ranges * (self.nodes - 1)
+            out[i:i+chunk] = np.clip(np.rint(_multilinear(self.grid, coords)), 0, 255)
+        return out.reshape(values.shape[:-1] + (3,))
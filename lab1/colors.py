@@ -0,0 +1,60 @@
+import colorsys
+
+def clamp(x, a, b):
+    return max(a, min(b, x))
+
+
+def rgb_to_cmyk(r, g, b):
+    if r == 0 and g == 0 and b == 0:
+        return 0.0, 0.0, 0.0, 100.0
+    r_p, g_p, b_p = r/255.0, g/255.0, b/255.0
+    k = 1 - max(r_p, g_p, b_p)
+    c = (1 - r_p - k) / (1 - k)
+    m = (1 - g_p - k) / (1 - k)
+    y = (1 - b_p - k) / (1 - k)
+    return round(c*100,4), round(m*100,4), round(y*100,4), round(k*100,4)
+
+
+def cmyk_to_rgb(c, m, y, k):
+    c_p = clamp(c,0,100)/100.0
+    m_p = clamp(m,0,100)/100.0
+    y_p = clamp(y,0,100)/100.0
+    k_p = clamp(k,0,100)/100.0
+    r = 255*(1 - c_p)*(1 - k_p)
+    g = 255*(1 - m_p)*(1 - k_p)
+    b = 255*(1 - y_p)*(1 - k_p)
+    return int(round(r)), int(round(g)), int(round(b))
+
+
+def rgb_to_hsv_deg(r, g, b):
+    r_p, g_p, b_p = r/255.0, g/255.0, b/255.0
+    h, s, v = colorsys.rgb_to_hsv(r_p, g_p, b_p)
+    return round(h*360,4), round(s*100,4), round(v*100,4)
+
+
+def hsv_deg_to_rgb(h, s, v):
+    h_p = (h % 360)/360.0
+    s_p = clamp(s,0,100)/100.0
+    v_p = clamp(v,0,100)/100.0
+    r_p, g_p, b_p = colorsys.hsv_to_rgb(h_p, s_p, v_p)
+    return int(round(r_p*255)), int(round(g_p*255)), int(round(b_p*255))
+
+
+def rgb_to_hex(r,g,b):
+    return f"#{r:02X}{g:02X}{b:02X}"
+
+
+def hex_to_rgb(hexstr):
+    s = hexstr.lstrip('#')
+    if len(s) == 3:
+        s = ''.join([ch*2 for ch in s])
+    if len(s) != 6:
+        raise ValueError('Bad hex')
+    return int(s[0:2],16), int(s[2:4],16), int(s[4:6],16)
+
+
+DEFAULT_PALETTE = [
+    '#000000', '#444444', '#888888', '#CCCCCC', '#FFFFFF',
+    '#FF0000', '#FF7F00', '#FFFF00', '#00FF00', '#00FFFF', '#0000FF', '#7F00FF', '#FF00FF',
+    '#800000', '#808000', '#008000', '#008080', '#000080', '#800080'
+]
@@ -0,0 +1,131 @@
+import math
+from collections import OrderedDict
+import numpy as np
+from color_arrays import _hsv_to_rgb
+
+CACHE_SIZE = 64
+
+
+def render_sv_plane(h, size):
+    # S растёт слева направо, V - снизу вверх. Для фиксированного H все
+    # компоненты colorsys (v, p, q, t) пропорциональны V, поэтому считаем
+    # пакетно одну строку при V = 1 и масштабируем её по строкам.
+    s = np.linspace(0.0, 1.0, size)
+    v = np.linspace(255.0, 0.0, size, dtype=np.float32)
+    row = _hsv_to_rgb(np.full(size, (h % 360)/360.0), s, np.ones(size))
+    out = np.empty((size, size, 3), dtype=np.uint8)
+    for ch, comp in enumerate(row):
+        np.rint(np.multiply.outer(v, comp.astype(np.float32)), out=out[..., ch], casting='unsafe')
+    return out
+
+
+def render_hue_ring(size, width, background=(240, 240, 240)):
+    c = (size - 1) / 2.0
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) - c
+    r = np.hypot(x, y)
+    ring = (r <= size / 2.0) & (r >= size / 2.0 - width)
+    hue = np.degrees(np.arctan2(-y[ring], x[ring])) % 360
+    rgb = _hsv_to_rgb(hue.astype(np.float64) / 360.0, np.ones(hue.size), np.ones(hue.size))
+    out = np.empty((size, size, 3), dtype=np.uint8)
+    out[:] = background
+    out[ring] = np.rint(np.stack(rgb, axis=-1) * 255)
+    return out
+
+
+def to_ppm(rgb):
+    h, w, _ = rgb.shape
+    return b'P6 %d %d 255\n' % (w, h) + np.ascontiguousarray(rgb).tobytes()
+
+
+class PlaneCache:
+    # Последние отрисованные плоскости SV (уже в PPM), ключ - оттенок
+    # с точностью 0.1° и размер
+    def __init__(self, capacity=CACHE_SIZE):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, h, size):
+        key = (round(h % 360, 1), size)
+        data = self.items.get(key)
+        if data is not None:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = to_ppm(render_sv_plane(key[0], size))
+        self.items[key] = data
+        if len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+        return data
+
+
+class HsvPicker:
+    # Кольцо оттенков с квадратом S/V внутри, на одном холсте
+    def __init__(self, tk, parent, on_pick, size=256, ring_width=None, background='#F0F0F0'):
+        self.on_pick = on_pick
+        self.size = size
+        self.ring_width = ring_width or max(8, size // 10)
+        inner = size / 2.0 - self.ring_width - 4
+        self.sv_size = int(inner * math.sqrt(2))
+        self.sv_origin = (size - self.sv_size) // 2
+        self.cache = PlaneCache()
+        self.h = self.s = self.v = None
+        self.shown_key = None
+        self.drag = None
+
+        bg = tuple(int(background[i:i+2], 16) for i in (1, 3, 5))
+        self.canvas = tk.Canvas(parent, width=size, height=size, highlightthickness=0, bg=background)
+        self.ring_photo = tk.PhotoImage(data=to_ppm(render_hue_ring(size, self.ring_width, bg)), format='PPM')
+        self.sv_photo = tk.PhotoImage(width=self.sv_size, height=self.sv_size)
+        self.canvas.create_image(0, 0, image=self.ring_photo, anchor='nw')
+        self.canvas.create_image(self.sv_origin, self.sv_origin, image=self.sv_photo, anchor='nw')
+        self.hue_marker = self.canvas.create_oval(0, 0, 0, 0, outline='black', width=2)
+        self.sv_marker = self.canvas.create_oval(0, 0, 0, 0, outline='white', width=2)
+        self.canvas.bind('<Button-1>', self.on_press)
+        self.canvas.bind('<B1-Motion>', self.on_drag)
+        self.canvas.bind('<ButtonRelease-1>', lambda e: setattr(self, 'drag', None))
+
+    def set_hsv(self, h, s, v):
+        # Плоскость SV перерисовывается только при смене оттенка
+        key = (round(h % 360, 1), self.sv_size)
+        if key != self.shown_key:
+            self.sv_photo.configure(data=self.cache.get(h, self.sv_size), format='PPM')
+            self.shown_key = key
+        self.h, self.s, self.v = h, s, v
+        c = self.size / 2.0
+        rad = math.radians(h)
+        mid = self.size / 2.0 - self.ring_width / 2.0
+        hx, hy = c + mid*math.cos(rad), c - mid*math.sin(rad)
+        m = self.ring_width / 2.0
+        self.canvas.coords(self.hue_marker, hx - m, hy - m, hx + m, hy + m)
+        x = self.sv_origin + s / 100.0 * (self.sv_size - 1)
+        y = self.sv_origin + (1 - v / 100.0) * (self.sv_size - 1)
+        self.canvas.coords(self.sv_marker, x - 5, y - 5, x + 5, y + 5)
+        self.canvas.itemconfig(self.sv_marker, outline='white' if v < 60 else 'black')
+
+    def on_press(self, event):
+        c = self.size / 2.0
+        r = math.hypot(event.x - c, event.y - c)
+        if self.size / 2.0 - self.ring_width <= r <= self.size / 2.0:
+            self.drag = 'hue'
+        elif (0 <= event.x - self.sv_origin < self.sv_size and
+              0 <= event.y - self.sv_origin < self.sv_size):
+            self.drag = 'sv'
+        else:
+            self.drag = None
+        self.on_drag(event)
+
+    def on_drag(self, event):
+        if self.drag is None or self.h is None:
+            return
+        h, s, v = self.h, self.s, self.v
+        if self.drag == 'hue':
+            c = self.size / 2.0
+            h = round(math.degrees(math.atan2(c - event.y, event.x - c)) % 360, 4)
+        else:
+            span = self.sv_size - 1
+            s = round(min(max(event.x - self.sv_origin, 0), span) / span * 100, 4)
+            v = round(100 - min(max(event.y - self.sv_origin, 0), span) / span * 100, 4)
+        self.on_pick(h, s, v)
@@ -1,79 +1,57 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import colorsys
-from functools import partial
+import os
+import sys
 
-def clamp(x, a, b):
-    return max(a, min(b, x))
-
-
-def rgb_to_cmyk(r, g, b):
-    if r == 0 and g == 0 and b == 0:
-        return 0.0, 0.0, 0.0, 100.0
-    r_p, g_p, b_p = r/255.0, g/255.0, b/255.0
-    k = 1 - max(r_p, g_p, b_p)
-    c = (1 - r_p - k) / (1 - k)
-    m = (1 - g_p - k) / (1 - k)
-    y = (1 - b_p - k) / (1 - k)
-    return round(c*100,4), round(m*100,4), round(y*100,4), round(k*100,4)
-
-
-def cmyk_to_rgb(c, m, y, k):
-    c_p = clamp(c,0,100)/100.0
-    m_p = clamp(m,0,100)/100.0
-    y_p = clamp(y,0,100)/100.0
-    k_p = clamp(k,0,100)/100.0
-    r = 255*(1 - c_p)*(1 - k_p)
-    g = 255*(1 - m_p)*(1 - k_p)
-    b = 255*(1 - y_p)*(1 - k_p)
-    return int(round(r)), int(round(g)), int(round(b))
-
-
-def rgb_to_hsv_deg(r, g, b):
-    r_p, g_p, b_p = r/255.0, g/255.0, b/255.0
-    h, s, v = colorsys.rgb_to_hsv(r_p, g_p, b_p)
-    return round(h*360,4), round(s*100,4), round(v*100,4)
-
-
-def hsv_deg_to_rgb(h, s, v):
-    h_p = (h % 360)/360.0
-    s_p = clamp(s,0,100)/100.0
-    v_p = clamp(v,0,100)/100.0
-    r_p, g_p, b_p = colorsys.hsv_to_rgb(h_p, s_p, v_p)
-    return int(round(r_p*255)), int(round(g_p*255)), int(round(b_p*255))
-
-
-def rgb_to_hex(r,g,b):
-    return f"#{r:02X}{g:02X}{b:02X}"
+if __name__ == '__main__':
+    # Запуск файлом: общий модуль instrument лежит в корне репозитория.
+    # При импорте main путь не трогается - его задаёт запускающий скрипт
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import instrument
+from instrument import span
+from colors import (clamp, rgb_to_cmyk, cmyk_to_rgb, rgb_to_hsv_deg, hsv_deg_to_rgb,
+                    rgb_to_hex, hex_to_rgb, DEFAULT_PALETTE)
 
-def hex_to_rgb(hexstr):
-    s = hexstr.lstrip('#')
-    if len(s) == 3:
-        s = ''.join([ch*2 for ch in s])
-    if len(s) != 6:
-        raise ValueError('Bad hex')
-    return int(s[0:2],16), int(s[2:4],16), int(s[4:6],16)
+tk = ttk = messagebox = None
 
 
-DEFAULT_PALETTE = [
-    '#000000', '#444444', '#888888', '#CCCCCC', '#FFFFFF',
-    '#FF0000', '#FF7F00', '#FFFF00', '#00FF00', '#00FFFF', '#0000FF', '#7F00FF', '#FF00FF',
-    '#800000', '#808000', '#008000', '#008080', '#000080', '#800080'
-]
+def load_tk():
+    # tkinter подгружается только при создании окна: пакетным задачам
+    # и хостам без дисплея нужны лишь функции из colors
+    global tk, ttk, messagebox
+    if tk is None:
+        import tkinter
+        from tkinter import ttk as tk_ttk, messagebox as tk_messagebox
+        tk, ttk, messagebox = tkinter, tk_ttk, tk_messagebox
+    return tk
 
 
 class ColorApp:
+    palette_cols = 12
+    swatch_size = 22
+    swatch_pad = 2
+    palette_visible_rows = 5
+
     def __init__(self, root):
+        load_tk()
         self.root = root
         root.title('CMYK <-> RGB <-> HSV')
         self.updating = False
+        self._pending = None
+        self._after_id = None
+
+        # Счётчики для измерения: сколько обратных вызовов, преобразований
+        # и записей в виджеты приходится на одно обновление
+        self.stats = {'callbacks': 0, 'updates': 0, 'conversions': 0, 'writes': 0}
+        self._stats_mark = dict(self.stats)
 
         self.r, self.g, self.b = 0, 0, 0
         self.c, self.m, self.y, self.k = rgb_to_cmyk(self.r, self.g, self.b)
         self.h, self.s, self.v = rgb_to_hsv_deg(self.r, self.g, self.b)
 
         self.palette = DEFAULT_PALETTE.copy()
+        self.palette_limit = 60
+        self.palette_indexes = {}
+        self.palette_items = []
 
         self.create_widgets()
         self.update_widgets_from_rgb()
@@ -86,8 +64,18 @@ class ColorApp:
     def create_widgets(self):
         palette_frame = ttk.LabelFrame(self.root, text='Palette', padding=(6,6))
         palette_frame.pack(fill='x', padx=8, pady=(8,0))
-        self.palette_canvas = tk.Frame(palette_frame)
-        self.palette_canvas.pack(fill='x')
+        swatches = ttk.Frame(palette_frame)
+        swatches.pack(fill='x')
+        step = self.swatch_size + self.swatch_pad
+        self.palette_canvas = tk.Canvas(swatches, width=self.palette_cols*step + self.swatch_pad,
+                                        highlightthickness=0)
+        self.palette_canvas.pack(side='left')
+        self.palette_scroll = ttk.Scrollbar(swatches, orient='vertical', command=self.palette_canvas.yview)
+        self.palette_canvas.configure(yscrollcommand=self.palette_scroll.set)
+        self.palette_canvas.bind('<Button-1>', self.on_palette_click)
+        self.palette_canvas.bind('<MouseWheel>', lambda e: self.palette_canvas.yview_scroll(-e.delta//120, 'units'))
+        self.palette_canvas.bind('<Button-4>', lambda e: self.palette_canvas.yview_scroll(-1, 'units'))
+        self.palette_canvas.bind('<Button-5>', lambda e: self.palette_canvas.yview_scroll(1, 'units'))
         self.draw_palette()
 
         add_row = ttk.Frame(palette_frame)
@@ -110,6 +98,18 @@ class ColorApp:
         hsv_fr.grid(row=0, column=2, sticky='nsew', padx=4, pady=4)
         top.columnconfigure((0,1,2), weight=1)
 
+        self.picker = None
+        try:
+            from hsv_picker import HsvPicker
+        except ImportError:
+            # Круг HSV считается через numpy; без него остаются ползунки
+            HsvPicker = None
+        if HsvPicker is not None:
+            picker_fr = self.create_frame_block(top, 'Picker')
+            picker_fr.grid(row=0, column=3, sticky='nsew', padx=4, pady=4)
+            self.picker = HsvPicker(tk, picker_fr, self.pick_hsv, size=220)
+            self.picker.canvas.pack()
+
         self.c_var = tk.DoubleVar(value=self.c)
         self.m_var = tk.DoubleVar(value=self.m)
         self.y_var = tk.DoubleVar(value=self.y)
@@ -148,21 +148,63 @@ class ColorApp:
         bottom.pack(fill='x')
         self.preview = tk.Canvas(bottom, height=80)
         self.preview.pack(side='left', fill='x', expand=True, padx=4)
+        self.preview_rect = self.preview.create_rectangle(0,0,1000,80, fill=rgb_to_hex(self.r,self.g,self.b), outline='')
         self.hex_var = tk.StringVar(value=rgb_to_hex(self.r,self.g,self.b))
         hex_lbl = ttk.Label(bottom, textvariable=self.hex_var, font=('TkDefaultFont', 12, 'bold'))
         hex_lbl.pack(side='right', padx=8)
 
 
     def draw_palette(self):
-        for w in self.palette_canvas.winfo_children():
-            w.destroy()
-
-        cols = 12
-        pad = 2
+        # Палитра - прямоугольники на одном холсте. Уже созданные элементы
+        # только перекрашиваются, новые создаются лишь при росте палитры
+        cols = self.palette_cols
+        size = self.swatch_size
+        pad = self.swatch_pad
+        step = size + pad
+        items = self.palette_items
         for i, hx in enumerate(self.palette):
-            btn = tk.Button(self.palette_canvas, bg=hx, activebackground=hx, width=2, height=1,
-                            command=partial(self.pick_hex, hx))
-            btn.grid(row=i//cols, column=i%cols, padx=pad, pady=pad)
+            if i < len(items):
+                item, shown = items[i]
+                if shown != hx:
+                    self.palette_canvas.itemconfig(item, fill=hx)
+                    items[i] = (item, hx)
+            else:
+                x0 = pad + (i % cols)*step
+                y0 = pad + (i // cols)*step
+                item = self.palette_canvas.create_rectangle(x0, y0, x0+size, y0+size, fill=hx, outline='#808080')
+                items.append((item, hx))
+        for item, _ in items[len(self.palette):]:
+            self.palette_canvas.delete(item)
+        del items[len(self.palette):]
+
+        rows = max(1, -(-len(self.palette) // cols))
+        self.palette_canvas.configure(height=min(rows, self.palette_visible_rows)*step + pad,
+                                      scrollregion=(0, 0, cols*step + pad, rows*step + pad))
+        if rows > self.palette_visible_rows:
+            self.palette_scroll.pack(side='left', fill='y')
+        else:
+            self.palette_scroll.pack_forget()
+
+
+    def on_palette_click(self, event):
+        step = self.swatch_size + self.swatch_pad
+        x = int(self.palette_canvas.canvasx(event.x)) - self.swatch_pad
+        y = int(self.palette_canvas.canvasy(event.y)) - self.swatch_pad
+        if x < 0 or y < 0 or x % step >= self.swatch_size or y % step >= self.swatch_size:
+            return
+        col, row = x // step, y // step
+        i = row*self.palette_cols + col
+        if col < self.palette_cols and i < len(self.palette):
+            self.pick_hex(self.palette[i])
+
+
+    def set_palette(self, colors):
+        # Загрузка целой библиотеки цветов (например, фирменной палитры)
+        self.palette = list(colors)
+        self.palette_limit = max(self.palette_limit, len(self.palette))
+        for index in self.palette_indexes.values():
+            index.set_palette(self.palette)
+        self.draw_palette()
 
 
     def pick_hex(self, hx):
@@ -171,14 +213,19 @@ class ColorApp:
         except Exception:
             return
 
-        self.updating = True
-        try:
-            self.r, self.g, self.b = r,g,b
-            self.c, self.m, self.y, self.k = rgb_to_cmyk(r,g,b)
-            self.h, self.s, self.v = rgb_to_hsv_deg(r,g,b)
+        instrument.event('palette')
+        self.r, self.g, self.b = r,g,b
+        self.c, self.m, self.y, self.k = self.convert(rgb_to_cmyk, r,g,b)
+        self.h, self.s, self.v = self.convert(rgb_to_hsv_deg, r,g,b)
+        with span('update', source='palette'):
             self.update_widgets_from_rgb()
-        finally:
-            self.updating = False
+        self.finish_update()
+
+
+    def pick_hsv(self, h, s, v):
+        # Запись в переменные идёт обычным путём: трассировки сольются
+        # в одно обновление за кадр
+        self.h_var.set(h); self.s_var.set(s); self.v_var.set(v)
 
 
     def add_palette_color(self):
@@ -195,12 +242,25 @@ class ColorApp:
 
         if hx.upper() not in [p.upper() for p in self.palette]:
             self.palette.insert(0, hx)
-            if len(self.palette) > 60:
-                self.palette = self.palette[:60]
+            for index in self.palette_indexes.values():
+                index.insert(0, hx)
+            if len(self.palette) > self.palette_limit:
+                self.palette = self.palette[:self.palette_limit]
+                for index in self.palette_indexes.values():
+                    index.truncate(self.palette_limit)
             self.draw_palette()
             self.new_hex_var.set('')
 
 
+    def palette_index(self, space='rgb'):
+        # Индекс ближайших цветов строится при первом запросе и дальше
+        # обновляется инкрементально; numpy грузится только здесь
+        if space not in self.palette_indexes:
+            from palette_index import PaletteIndex
+            self.palette_indexes[space] = PaletteIndex(self.palette, space)
+        return self.palette_indexes[space]
+
+
     def make_scale_widget(self, parent, name, frm, to, var, command):
         row = ttk.Frame(parent)
         row.pack(fill='x', pady=2)
@@ -214,73 +274,146 @@ class ColorApp:
 
 
     def on_rgb_change(self):
+        self.schedule_update('rgb')
+
+
+    def on_cmyk_change(self):
+        self.schedule_update('cmyk')
+
+
+    def on_hsv_change(self):
+        self.schedule_update('hsv')
+
+
+    def schedule_update(self, source):
+        # Все трассировки и команды ползунков за один кадр сливаются
+        # в одно обновление через after_idle
+        self.stats['callbacks'] += 1
         if self.updating: return
+        instrument.event(source)
+        self._pending = source
+        if self._after_id is None:
+            self._after_id = self.root.after_idle(self.flush_update)
+
+
+    def flush_update(self):
+        self._after_id = None
+        source, self._pending = self._pending, None
+        if source is None: return
+        handler = {'rgb': self.read_rgb, 'cmyk': self.read_cmyk, 'hsv': self.read_hsv}[source]
+        with span('update', source=source):
+            if handler():
+                self.update_widgets_from_rgb()
+        self.finish_update()
+
+
+    def convert(self, func, *args):
+        self.stats['conversions'] += 1
+        with span(func.__name__):
+            return func(*args)
+
+
+    def finish_update(self):
+        self.stats['updates'] += 1
+        instrument.painted(self.root)
+        # Сколько обратных вызовов, преобразований и записей пришлось на это
+        # обновление - в трассу и сводку (--trace)
+        delta = {key: self.stats[key] - self._stats_mark[key] for key in self.stats}
+        self._stats_mark = dict(self.stats)
+        instrument.counter('per update', delta)
+
+
+    def read_rgb(self):
         try:
-            self.updating = True
             r = int(self.r_var.get())
             g = int(self.g_var.get())
             b = int(self.b_var.get())
         except Exception:
-            self.updating = False
-            return
+            return False
         r = clamp(r,0,255); g = clamp(g,0,255); b = clamp(b,0,255)
         self.r, self.g, self.b = r,g,b
 
-        self.c, self.m, self.y, self.k = rgb_to_cmyk(r,g,b)
-        self.h, self.s, self.v = rgb_to_hsv_deg(r,g,b)
-        self.update_widgets_from_rgb()
-        self.updating = False
+        self.c, self.m, self.y, self.k = self.convert(rgb_to_cmyk, r,g,b)
+        self.h, self.s, self.v = self.convert(rgb_to_hsv_deg, r,g,b)
+        return True
 
 
-    def on_cmyk_change(self):
-        if self.updating: return
+    def read_cmyk(self):
         try:
             c = float(self.c_var.get())
             m = float(self.m_var.get())
             y = float(self.y_var.get())
             k = float(self.k_var.get())
         except Exception:
-            return
+            return False
         c = clamp(c,0,100); m = clamp(m,0,100); y = clamp(y,0,100); k = clamp(k,0,100)
         self.c, self.m, self.y, self.k = c,m,y,k
-        self.updating = True
-        r,g,b = cmyk_to_rgb(c,m,y,k)
+        r,g,b = self.convert(cmyk_to_rgb, c,m,y,k)
         self.r, self.g, self.b = r,g,b
-        self.h, self.s, self.v = rgb_to_hsv_deg(r,g,b)
-        self.update_widgets_from_rgb()
-        self.updating = False
+        self.h, self.s, self.v = self.convert(rgb_to_hsv_deg, r,g,b)
+        return True
 
 
-    def on_hsv_change(self):
-        if self.updating: return
+    def read_hsv(self):
         try:
             h = float(self.h_var.get())
             s = float(self.s_var.get())
             v = float(self.v_var.get())
         except Exception:
-            return
+            return False
         if h > 360:
             h = h % 360.0
         s = clamp(s,0,100); v = clamp(v,0,100)
         self.h, self.s, self.v = h,s,v
-        self.updating = True
-        r,g,b = hsv_deg_to_rgb(h,s,v)
+        r,g,b = self.convert(hsv_deg_to_rgb, h,s,v)
         self.r, self.g, self.b = r,g,b
-        self.c, self.m, self.y, self.k = rgb_to_cmyk(r,g,b)
-        self.update_widgets_from_rgb()
-        self.updating = False
+        self.c, self.m, self.y, self.k = self.convert(rgb_to_cmyk, r,g,b)
+        return True
+
+
+    def set_if_changed(self, var, value):
+        # Сравнивается сырое значение Tcl: IntVar.get() отбрасывает дробную
+        # часть, которую пишет ttk.Scale, и целое тогда не записалось бы
+        try:
+            same = str(self.root.getvar(str(var))) == str(value)
+        except Exception:
+            same = False
+        if not same:
+            var.set(value)
+            self.stats['writes'] += 1
 
 
     def update_widgets_from_rgb(self):
-        self.r_var.set(self.r); self.g_var.set(self.g); self.b_var.set(self.b)
-        self.c_var.set(self.c); self.m_var.set(self.m); self.y_var.set(self.y); self.k_var.set(self.k)
-        self.h_var.set(self.h); self.s_var.set(self.s); self.v_var.set(self.v)
-        self.hex_var.set(rgb_to_hex(self.r,self.g,self.b))
-        self.preview.delete('all')
-        self.preview.create_rectangle(0,0,1000,80, fill=rgb_to_hex(self.r,self.g,self.b), outline='')
+        # Пишем только изменившиеся значения: каждая запись - это
+        # трассировка и перерисовка ползунка
+        self.updating = True
+        try:
+            for var, value in ((self.r_var, self.r), (self.g_var, self.g), (self.b_var, self.b),
+                               (self.c_var, self.c), (self.m_var, self.m), (self.y_var, self.y), (self.k_var, self.k),
+                               (self.h_var, self.h), (self.s_var, self.s), (self.v_var, self.v),
+                               (self.hex_var, rgb_to_hex(self.r,self.g,self.b))):
+                self.set_if_changed(var, value)
+        finally:
+            self.updating = False
+        hx = self.hex_var.get()
+        if self.preview.itemcget(self.preview_rect, 'fill') != hx:
+            self.preview.itemconfig(self.preview_rect, fill=hx)
+        if self.picker is not None:
+            with span('picker'):
+                self.picker.set_hsv(self.h, self.s, self.v)
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description='CMYK <-> RGB <-> HSV color picker')
+    instrument.add_argument(ap)
+    args = ap.parse_args()
+    instrument.enable(args.trace)
+    root = load_tk().Tk()
+    ColorApp(root)
+    instrument.overlay(tk, root)
+    root.mainloop()
 
 
 if __name__ == '__main__':
-    root = tk.Tk()
-    app = ColorApp(root)
-    root.mainloop()
+    main()
@@ -0,0 +1,208 @@
+import numpy as np
+from color_arrays import hex_to_rgb_array, _rgb_to_hsv
+
+CELL_BITS = 3                      # ячейка 8x8x8 значений RGB -> сетка 32^3
+CELLS = 1 << (3 * (8 - CELL_BITS))
+QUERY_CHUNK = 1 << 16
+
+_hsv_cell_bounds = None
+
+
+def to_space(rgb, space):
+    # Координаты, в которых считается евклидово расстояние:
+    # 'rgb' - сами значения 0..255, 'hsv' - конус (S*V*cos H, S*V*sin H, V), масштаб 0..255
+    rgb = np.asarray(rgb, dtype=np.float32).reshape(-1, 3)
+    if space == 'rgb':
+        return rgb
+    if space == 'hsv':
+        h, s, v = _rgb_to_hsv(*(rgb[:, j].astype(np.float64) / 255.0 for j in range(3)))
+        angle = 2 * np.pi * h
+        sv = s * v * 255.0
+        return np.stack([sv * np.cos(angle), sv * np.sin(angle), v * 255.0], axis=-1).astype(np.float32)
+    raise ValueError(f'Unknown color space {space!r}')
+
+
+def cell_of(rgb):
+    rgb = np.asarray(rgb).reshape(-1, 3).astype(np.int32) >> CELL_BITS
+    side = 8 - CELL_BITS
+    return (rgb[:, 0] << (2 * side)) | (rgb[:, 1] << side) | rgb[:, 2]
+
+
+def cell_bounds(space):
+    # Описанный вокруг каждой ячейки параллелепипед в пространстве расстояний
+    global _hsv_cell_bounds
+    side = 1 << (8 - CELL_BITS)
+    step = 1 << CELL_BITS
+    if space == 'rgb':
+        lo = np.stack(np.meshgrid(*[np.arange(side) * step] * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+        return lo.astype(np.float32), (lo + step - 1).astype(np.float32)
+    if _hsv_cell_bounds is None:
+        # Преобразуем все 2^24 цвета по слоям R и сворачиваем по ячейкам
+        lo = np.empty((side, side, side, 3), np.float32)
+        hi = np.empty((side, side, side, 3), np.float32)
+        g, b = np.meshgrid(np.arange(256), np.arange(256), indexing='ij')
+        for cr in range(side):
+            r = np.repeat(np.arange(cr * step, (cr + 1) * step), 256 * 256)
+            pts = to_space(np.column_stack([r, np.tile(g.ravel(), step), np.tile(b.ravel(), step)]), 'hsv')
+            pts = pts.reshape(step, side, step, side, step, 3)
+            lo[cr] = pts.min(axis=(0, 2, 4))
+            hi[cr] = pts.max(axis=(0, 2, 4))
+        _hsv_cell_bounds = lo.reshape(-1, 3), hi.reshape(-1, 3)
+    return _hsv_cell_bounds
+
+
+class PaletteIndex:
+    # Для каждой ячейки 32^3 хранится список цветов палитры, которые могут
+    # оказаться ближайшими хотя бы для одной точки ячейки. Запрос считает
+    # расстояния только до этих кандидатов, результат совпадает с перебором.
+    def __init__(self, palette, space='rgb'):
+        self.space = space
+        self.lo, self.hi = cell_bounds(space)
+        self.set_palette(palette)
+
+    def set_palette(self, palette):
+        rgb = hex_to_rgb_array(list(palette)).reshape(-1, 3)
+        self.rgb = rgb
+        self.points = to_space(rgb, self.space)
+        self.slots = list(range(len(rgb)))          # позиция в палитре -> слот
+        self._update_positions()
+        self.cand = np.zeros((CELLS, 1), dtype=np.int32)
+        self.bound = np.zeros(CELLS, dtype=np.float32)
+        self.ncand = np.zeros(CELLS, dtype=np.int32)
+        self._recompute_cells(np.arange(CELLS))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _update_positions(self):
+        self.position = np.full(len(self.rgb), -1, dtype=np.int32)
+        self.position[self.slots] = np.arange(len(self.slots))
+
+    def _cell_distances(self, cells, points):
+        lo = self.lo[cells][:, None, :]
+        hi = self.hi[cells][:, None, :]
+        p = points[None, :, :]
+        near = np.maximum(np.maximum(lo - p, p - hi), 0)
+        far = np.maximum(np.abs(p - lo), np.abs(p - hi))
+        return (near * near).sum(-1), (far * far).sum(-1)
+
+    def _recompute_cells(self, cells, chunk=4096):
+        live = np.array(self.slots, dtype=np.int32)
+        if len(live) == 0:
+            raise ValueError('Palette is empty')
+        rows = []
+        for i in range(0, len(cells), chunk):
+            part = cells[i:i+chunk]
+            mind, maxd = self._cell_distances(part, self.points[live])
+            self.bound[part] = maxd.min(axis=1)
+            # Небольшой запас на округление float32
+            keep = mind <= self.bound[part][:, None] * (1 + 1e-5) + 1e-3
+            counts = keep.sum(axis=1)
+            self.ncand[part] = counts
+            # Кандидаты по возрастанию позиции, хвост дополнен последним
+            # кандидатом, чтобы argmin при равенстве брал меньшую позицию
+            order = np.argsort(~keep, axis=1, kind='stable')[:, :counts.max()]
+            cols = np.minimum(np.arange(order.shape[1]), counts[:, None] - 1)
+            rows.append(live[np.take_along_axis(order, cols, axis=1)])
+        width = max(r.shape[1] for r in rows)
+        if width > self.cand.shape[1]:
+            self.cand = np.concatenate([self.cand, np.repeat(self.cand[:, -1:], width - self.cand.shape[1], axis=1)], axis=1)
+        for i, r in zip(range(0, len(cells), chunk), rows):
+            pad = np.repeat(r[:, -1:], self.cand.shape[1] - r.shape[1], axis=1)
+            self.cand[cells[i:i+chunk]] = np.concatenate([r, pad], axis=1)
+
+    def insert(self, pos, hx):
+        # Новый цвет затрагивает только ячейки, до которых он ближе текущей
+        # границы; в остальных порядок кандидатов по позиции не меняется
+        rgb = hex_to_rgb_array([hx]).reshape(1, 3)
+        point = to_space(rgb, self.space)
+        slot = len(self.rgb)
+        self.rgb = np.concatenate([self.rgb, rgb])
+        self.points = np.concatenate([self.points, point])
+        self.slots.insert(pos, slot)
+        self._update_positions()
+        mind, _ = self._cell_distances(np.arange(CELLS), point)
+        touched = np.nonzero(mind[:, 0] <= self.bound * (1 + 1e-5) + 1e-3)[0]
+        if len(touched):
+            self._recompute_cells(touched)
+
+    def remove(self, pos):
+        slot = self.slots.pop(pos)
+        self._update_positions()
+        touched = np.nonzero((self.cand == slot).any(axis=1))[0]
+        if len(touched):
+            self._recompute_cells(touched)
+        if 2 * len(self.slots) < len(self.rgb):
+            self._compact()
+
+    def _compact(self):
+        # Удалённые цвета остаются строками rgb/points, пока их не станет
+        # больше живых; тогда слоты перенумеровываются по позициям. В cand
+        # только живые слоты, и порядок позиций при этом не меняется
+        live = np.array(self.slots, dtype=np.int32)
+        remap = np.zeros(len(self.rgb), dtype=np.int32)
+        remap[live] = np.arange(len(live), dtype=np.int32)
+        self.rgb = self.rgb[live]
+        self.points = self.points[live]
+        self.cand = remap[self.cand]
+        self.slots = list(range(len(live)))
+        self._update_positions()
+
+    def truncate(self, n):
+        while len(self.slots) > n:
+            self.remove(len(self.slots) - 1)
+
+    def nearest(self, rgb):
+        rgb = np.asarray(rgb)
+        flat = rgb.reshape(-1, 3)
+        out = np.empty(flat.shape[0], dtype=np.int32)
+        for i in range(0, flat.shape[0], QUERY_CHUNK):
+            block = flat[i:i+QUERY_CHUNK]
+            cells = cell_of(block)
+            slots = self.cand[cells, 0]
+            # В большинстве ячеек кандидат один - расстояния не нужны
+            multi = np.nonzero(self.ncand[cells] > 1)[0]
+            if len(multi):
+                cells = cells[multi]
+                cand = self.cand[cells, :self.ncand[cells].max()]
+                diff = self.points[cand] - to_space(block[multi], self.space)[:, None, :]
+                best = np.argmin((diff * diff).sum(-1), axis=1)
+                slots[multi] = cand[np.arange(len(cand)), best]
+            out[i:i+QUERY_CHUNK] = self.position[slots]
+        return out.reshape(rgb.shape[:-1])
+
+    def palette_rgb(self):
+        return self.rgb[self.slots]
+
+    def quantize(self, image, dither=False):
+        image = np.asarray(image)
+        if image.ndim != 3 or image.shape[2] != 3:
+            raise ValueError('Expected an (H, W, 3) RGB array')
+        idx = self._dither(image) if dither else self.nearest(image)
+        return self.palette_rgb()[idx]
+
+    def _dither(self, image):
+        # Флойд-Стейнберг фронтом волны: пиксель (y, x) обрабатывается на шаге
+        # t = x + 2y, когда все его источники ошибки уже посчитаны, поэтому
+        # каждый шаг - одна векторная операция над целой диагональю
+        h, w, _ = image.shape
+        work = image.astype(np.float32)
+        idx = np.empty((h, w), dtype=np.int32)
+        colors = self.palette_rgb().astype(np.float32)
+        for t in range(w + 2 * (h - 1)):
+            ys = np.arange(max(0, (t - w + 2) // 2), min(h - 1, t // 2) + 1)
+            xs = t - 2 * ys
+            px = work[ys, xs]
+            best = self.nearest(np.clip(np.rint(px), 0, 255).astype(np.uint8))
+            idx[ys, xs] = best
+            err = px - colors[best]
+            m = xs + 1 < w
+            work[ys[m], xs[m] + 1] += err[m] * (7 / 16)
+            m = ys + 1 < h
+            ys1, xs1, e1 = ys[m] + 1, xs[m], err[m]
+            left = xs1 > 0
+            work[ys1[left], xs1[left] - 1] += e1[left] * (3 / 16)
+            work[ys1, xs1] += e1 * (5 / 16)
+            right = xs1 + 1 < w
+            work[ys1[right], xs1[right] + 1] += e1[right] * (1 / 16)
+        return idx
@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Модули лабораторной импортируют друг друга по короткому имени,
+# общий instrument - из корня репозитория
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.append(os.path.dirname(HERE))
+
+# Процессы пула (forkserver/spawn) заново импортируют этот модуль -
+# запускать что-либо можно только в главном процессе
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        from batch import main
+        sys.exit(main(sys.argv[2:]))
+
+    from main import main
+    main()
@@ -0,0 +1,67 @@
+import numpy as np
+from PIL import Image
+
+# Строк за один проход: ограничивает размер временных массивов
+CHUNK_PIXELS = 1 << 20
+
+METHODS = ('sauvola', 'niblack', 'bradley')
+DEFAULT_K = {'sauvola': 0.2, 'niblack': -0.2, 'bradley': 0.15}
+SAUVOLA_R = 128.0
+
+
+def integral_images(arr):
+    # Таблицы сумм I и I^2 с нулевой первой строкой и столбцом, int64 - точно
+    h, w = arr.shape
+    s1 = np.zeros((h + 1, w + 1), dtype=np.int64)
+    s2 = np.zeros((h + 1, w + 1), dtype=np.int64)
+    a = arr.astype(np.int64)
+    np.cumsum(np.cumsum(a, axis=0), axis=1, out=s1[1:, 1:])
+    np.cumsum(np.cumsum(a * a, axis=0), axis=1, out=s2[1:, 1:])
+    return s1, s2
+
+
+def local_threshold(arr, total, total_sq, count, method, k):
+    # Порог по сумме, сумме квадратов и числу пикселей окна; 255 - выше порога
+    mean = total / count
+    if method == 'bradley':
+        t = mean * (1 - k)
+    else:
+        std = np.sqrt(np.maximum(total_sq / count - mean * mean, 0.0))
+        if method == 'niblack':
+            t = mean + k * std
+        elif method == 'sauvola':
+            t = mean * (1 + k * (std / SAUVOLA_R - 1))
+        else:
+            raise ValueError(f'unknown method: {method}')
+    return np.where(arr > t, 255, 0).astype(np.uint8)
+
+
+class AdaptiveThreshold:
+    # Интегральные изображения считаются один раз на серое изображение;
+    # смена метода, k или окна - только O(1) на пиксель по таблицам.
+    # Окно у края обрезается по изображению.
+    def __init__(self, gray):
+        self.arr = np.asarray(gray, dtype=np.uint8)
+        self.s1, self.s2 = integral_images(self.arr)
+
+    def apply(self, method, size, k=None):
+        if method not in METHODS:
+            raise ValueError(f'unknown method: {method}')
+        if k is None:
+            k = DEFAULT_K[method]
+        h, w = self.arr.shape
+        r = size // 2
+        x0 = np.maximum(np.arange(w) - r, 0)
+        x1 = np.minimum(np.arange(w) + r + 1, w)
+        out = np.empty((h, w), dtype=np.uint8)
+        step = max(1, CHUNK_PIXELS // w)
+        for y in range(0, h, step):
+            ys = np.arange(y, min(y + step, h))
+            y0 = np.maximum(ys - r, 0)[:, None]
+            y1 = np.minimum(ys + r + 1, h)[:, None]
+            count = (y1 - y0) * (x1 - x0)
+            sums = []
+            for s in (self.s1, self.s2):
+                sums.append((s[y1, x1] - s[y0, x1] - s[y1, x0] + s[y0, x0]).astype(np.float64))
+            out[ys[0]:ys[-1] + 1] = local_threshold(self.arr[ys[0]:ys[-1] + 1], sums[0], sums[1], count, method, k)
+        return Image.fromarray(out).convert('1', dither=Image.Dither.NONE)
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from PIL import Image, ImageOps
+from rank_filters import PLANE_FILTERS, rank_filter
+from threshold import binarize, gray_histogram, levels_lut, multi_otsu, otsu_from_histogram
+from tiles import cpu_count
+from loader import open_image
+from frames import STREAM_FORMATS, frame_info, iter_frames, process_frames, save_frames
+
+EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.gif', '.webp')
+
+
+def parse_pipeline(text):
+    # "median:5,otsu,threshold:100,max:3" -> [('median', 5), ('otsu', 1), ...]
+    steps = []
+    for part in text.split(','):
+        name, _, arg = part.strip().partition(':')
+        if name in PLANE_FILTERS:
+            size = int(arg or 3)
+            if size < 3 or size % 2 == 0:
+                raise ValueError(f'{name}: odd size >=3 required')
+            steps.append((name, size))
+        elif name == 'threshold':
+            t = int(arg or 128)
+            if not 0 <= t <= 255:
+                raise ValueError('threshold must be in 0..255')
+            steps.append((name, t))
+        elif name == 'otsu':
+            # otsu - бинаризация, otsu:N - N порогов (N + 1 уровень серого)
+            levels = int(arg or 1)
+            if not 1 <= levels <= 4:
+                raise ValueError('otsu: 1..4 thresholds')
+            steps.append((name, levels))
+        else:
+            raise ValueError(f'unknown pipeline step: {part.strip()!r}')
+    if not steps:
+        raise ValueError('empty pipeline')
+    return steps
+
+
+def run_pipeline(img, steps):
+    for name, arg in steps:
+        if name == 'threshold':
+            img = binarize(img, arg)
+        elif name == 'otsu':
+            gray = ImageOps.grayscale(img)
+            hist = gray_histogram(gray)
+            if arg == 1:
+                img = binarize(gray, otsu_from_histogram(hist))
+            else:
+                img = gray.point(levels_lut(multi_otsu(hist, arg)))
+        else:
+            img = rank_filter(img, name, arg)
+    return img
+
+
+def find_images(src, skip=None):
+    # skip - каталог, который не обходится (выходной внутри входного)
+    skip = os.path.realpath(skip) if skip else None
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames[:] = sorted(d for d in dirnames if os.path.realpath(os.path.join(dirpath, d)) != skip)
+        for name in sorted(filenames):
+            if name.lower().endswith(EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def output_path(path, src, dst, ext):
+    rel = os.path.relpath(path, src)
+    return os.path.join(dst, os.path.splitext(rel)[0] + ext)
+
+
+def recipe(steps, ext):
+    # Что было сделано с файлом: нормализованный конвейер и формат. Хранится
+    # рядом с результатом; другой рецепт - результат устарел
+    fmt = Image.registered_extensions()[ext.lower()]
+    return ','.join(f'{name}:{arg}' for name, arg in steps) + f' -> {fmt}'
+
+
+def recipe_path(out):
+    return out + '.recipe'
+
+
+def up_to_date(path, out, want):
+    try:
+        if os.stat(out).st_mtime < os.stat(path).st_mtime:
+            return False
+        with open(recipe_path(out)) as f:
+            return f.read().strip() == want
+    except FileNotFoundError:
+        return False
+
+
+def process_image(path, tmp, fmt, steps):
+    t0 = time.perf_counter()
+    img = open_image(path)
+    t1 = time.perf_counter()
+    img = run_pipeline(img, steps)
+    t2 = time.perf_counter()
+    if img.mode == '1' and fmt == 'JPEG':
+        img = img.convert('L')
+    img.save(tmp, format=fmt)
+    t3 = time.perf_counter()
+    return {
+        'decode_s': round(t1 - t0, 6),
+        'process_s': round(t2 - t1, 6),
+        'encode_s': round(t3 - t2, 6),
+        'total_s': round(t3 - t0, 6),
+        'pixels': img.width * img.height,
+    }
+
+
+def process_animation(path, tmp, fmt, steps, n, loop):
+    # Кадры идут потоком: декодирование, обработка и запись чередуются,
+    # в памяти - один кадр. Параллельность и так есть - по файлам
+    t0 = time.perf_counter()
+    frames = process_frames(iter_frames(path), run_pipeline, steps, workers=1)
+    save_frames(tmp, frames, n, format=fmt, loop=loop)
+    with Image.open(path) as im:
+        pixels = im.width * im.height * n
+    return {'frames': n, 'total_s': round(time.perf_counter() - t0, 6), 'pixels': pixels}
+
+
+def process_file(path, out, steps):
+    # Выполняется в процессе пула: декодирование, обработка, запись
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    # Через временный файл: оборванная запись не выглядит актуальной
+    tmp = out + '.part'
+    ext = os.path.splitext(out)[1]
+    fmt = Image.registered_extensions()[ext.lower()]
+    # Старый рецепт убирается до записи: если дальше что-то упадёт,
+    # результат не будет считаться актуальным
+    try:
+        os.remove(recipe_path(out))
+    except FileNotFoundError:
+        pass
+    try:
+        # Анимацию - целиком, если формат результата её держит; иначе первый кадр
+        n, loop = frame_info(path)
+        if n > 1 and fmt in STREAM_FORMATS:
+            entry = process_animation(path, tmp, fmt, steps, n, loop)
+        else:
+            entry = process_image(path, tmp, fmt, steps)
+        os.replace(tmp, out)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    with open(recipe_path(out), 'w') as f:
+        f.write(recipe(steps, ext) + '\n')
+    entry['mpx_per_s'] = round(entry['pixels'] / 1e6 / entry['total_s'], 3)
+    entry['bytes'] = os.path.getsize(out)
+    return entry
+
+
+def run_batch(src, dst, steps, workers=None, ext='.png', force=False, report=None, inflight=None):
+    workers = workers or cpu_count()
+    inflight = inflight or 2 * workers
+    want = recipe(steps, ext)
+    counts = {'ok': 0, 'skipped': 0, 'error': 0}
+    t_start = time.perf_counter()
+    pixels = 0
+
+    def record(entry):
+        counts[entry['status']] += 1
+        if report is not None:
+            report.write(json.dumps(entry) + '\n')
+            report.flush()
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = {}
+
+        def collect(done):
+            nonlocal pixels
+            for fut in done:
+                path, out = pending.pop(fut)
+                entry = {'input': path, 'output': out}
+                try:
+                    entry.update(fut.result(), status='ok')
+                    pixels += entry['pixels']
+                except Exception as e:
+                    entry.update(status='error', error=f'{type(e).__name__}: {e}')
+                record(entry)
+
+        # a.jpg и a.png дали бы один a.png: второй файл не обрабатывается
+        claimed = {}
+        for path in find_images(src, skip=dst):
+            out = output_path(path, src, dst, ext)
+            first = claimed.setdefault(os.path.normcase(out), path)
+            if first != path:
+                record({'input': path, 'output': out, 'status': 'error',
+                        'error': f'output collides with {first}'})
+                continue
+            if not force and up_to_date(path, out, want):
+                record({'input': path, 'output': out, 'status': 'skipped'})
+                continue
+            # Не больше inflight файлов одновременно в памяти
+            if len(pending) >= inflight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(process_file, path, out, steps)] = (path, out)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    elapsed = time.perf_counter() - t_start
+    summary = dict(counts, elapsed_s=round(elapsed, 3), pixels=pixels,
+                   mpx_per_s=round(pixels / 1e6 / elapsed, 3) if elapsed else 0.0)
+    if report is not None:
+        report.write(json.dumps({'summary': summary}) + '\n')
+    return summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m lab2 batch',
+                                 description='Run a filter/threshold pipeline over a directory of images')
+    ap.add_argument('src', help='input directory')
+    ap.add_argument('dst', help='output directory (same relative layout)')
+    ap.add_argument('--pipeline', required=True, help='comma separated steps: min:N, median:N, max:N, threshold:T, otsu[:N]')
+    ap.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    ap.add_argument('--format', default='png', help='output file extension')
+    ap.add_argument('--force', action='store_true', help='reprocess files whose output is up to date')
+    ap.add_argument('--report', help='JSON lines report (default: <dst>/report.jsonl)')
+    args = ap.parse_args(argv)
+    try:
+        steps = parse_pipeline(args.pipeline)
+    except ValueError as e:
+        ap.error(str(e))
+    ext = '.' + args.format.lower().lstrip('.')
+    if ext not in Image.registered_extensions():
+        ap.error(f'unknown output format: {args.format}')
+    if not os.path.isdir(args.src):
+        ap.error(f'not a directory: {args.src}')
+
+    os.makedirs(args.dst, exist_ok=True)
+    report_path = args.report or os.path.join(args.dst, 'report.jsonl')
+    with open(report_path, 'a') as report:
+        summary = run_batch(args.src, args.dst, steps, args.workers, ext, args.force, report)
+    print(f'{summary["ok"]} processed, {summary["skipped"]} up to date, {summary["error"]} failed '
+          f'in {summary["elapsed_s"]:.2f} s ({summary["mpx_per_s"]:.2f} MP/s); report: {report_path}')
+    return 1 if summary['error'] else 0
@@ -0,0 +1,62 @@
+import argparse
+import glob
+import os
+import time
+import numpy as np
+from PIL import Image, ImageOps
+from adaptive import DEFAULT_K, METHODS, AdaptiveThreshold, local_threshold
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def naive(arr, method, size, k):
+    # Скользящее окно: суммы по size*size сдвигам, O(size^2) на пиксель
+    h, w = arr.shape
+    r = size // 2
+    a = np.pad(arr.astype(np.int64), r)
+    ones = np.pad(np.ones((h, w), dtype=np.int64), r)
+    total = np.zeros((h, w), dtype=np.int64)
+    total_sq = np.zeros((h, w), dtype=np.int64)
+    count = np.zeros((h, w), dtype=np.int64)
+    for dy in range(size):
+        for dx in range(size):
+            win = a[dy:dy + h, dx:dx + w]
+            total += win
+            total_sq += win * win
+            count += ones[dy:dy + h, dx:dx + w]
+    return local_threshold(arr, total.astype(np.float64), total_sq.astype(np.float64), count, method, k)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Adaptive thresholding: integral images vs naive sliding window')
+    ap.add_argument('images', nargs='*', help='default: test_images/*')
+    ap.add_argument('--sizes', default='3,11,21,51')
+    ap.add_argument('--scale', type=float, default=1.0, help='resize images before thresholding')
+    args = ap.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+    paths = args.images or sorted(glob.glob(os.path.join(HERE, 'test_images', '*')))
+
+    for path in paths:
+        gray = ImageOps.grayscale(Image.open(path).convert('RGB'))
+        if args.scale != 1:
+            gray = gray.resize((round(gray.width * args.scale), round(gray.height * args.scale)), Image.LANCZOS)
+        arr = np.asarray(gray)
+        t0 = time.perf_counter()
+        engine = AdaptiveThreshold(gray)
+        t_build = time.perf_counter() - t0
+        print(f'{os.path.basename(path)}: {gray.width}x{gray.height}, integral images {t_build * 1000:.1f} ms')
+        for method in METHODS:
+            for size in sizes:
+                t0 = time.perf_counter()
+                out = np.asarray(engine.apply(method, size).convert('L'))
+                t_fast = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                ref = naive(arr, method, size, DEFAULT_K[method])
+                t_naive = time.perf_counter() - t0
+                same = 'yes' if np.array_equal(out, ref) else 'NO'
+                print(f'    {method:<8} {size:>3}  integral {t_fast * 1000:8.1f} ms  naive {t_naive * 1000:9.1f} ms  '
+                      f'x{t_naive / t_fast:6.1f}  same: {same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import glob
+import os
+import time
+import numpy as np
+from PIL import Image
+from rank_filters import PIL_FILTERS, PLANE_FILTERS, rank_filter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = func()
+        t = time.perf_counter() - t0
+        best = t if best is None or t < best else best
+    return best, out
+
+
+def load(path, scale, mode):
+    img = Image.open(path).convert(mode)
+    if scale != 1:
+        img = img.resize((round(img.width * scale), round(img.height * scale)), Image.LANCZOS)
+    return img
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Rank filters (min/median/max): numpy engine vs PIL')
+    ap.add_argument('images', nargs='*', help='default: test_images/*')
+    ap.add_argument('--sizes', default='3,5,7,9,11,13,15,17,19,21')
+    ap.add_argument('--kinds', default='min,median,max')
+    ap.add_argument('--mode', default='RGB', choices=('L', 'RGB'))
+    ap.add_argument('--scale', type=float, default=1.0, help='resize images before filtering')
+    ap.add_argument('--repeat', type=int, default=1)
+    ap.add_argument('--no-pil', action='store_true', help='skip PIL timing and the equality check')
+    args = ap.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+    kinds = [k.strip() for k in args.kinds.split(',')]
+    paths = args.images or sorted(glob.glob(os.path.join(HERE, 'test_images', '*')))
+
+    mismatches = 0
+    for path in paths:
+        img = load(path, args.scale, args.mode)
+        mp = img.width * img.height / 1e6
+        print(f'{os.path.basename(path)}: {img.width}x{img.height} {img.mode} ({mp:.2f} MP)')
+        print(f'    {"kind":<7} {"size":>4} {"ours, s":>9} {"PIL, s":>9} {"speedup":>8}  same')
+        for kind in kinds:
+            for size in sizes:
+                # Движок напрямую, без отката на PIL для малых медиан
+                def ours():
+                    bands = [Image.fromarray(PLANE_FILTERS[kind](np.asarray(b), size)) for b in img.split()]
+                    return bands[0] if len(bands) == 1 else Image.merge(img.mode, bands)
+                t_ours, out = timed(ours, args.repeat)
+                line = f'    {kind:<7} {size:>4} {t_ours:9.3f}'
+                if not args.no_pil:
+                    t_pil, ref = timed(lambda: img.filter(PIL_FILTERS[kind](size)), args.repeat)
+                    same = out.tobytes() == ref.tobytes() and rank_filter(img, kind, size).tobytes() == ref.tobytes()
+                    mismatches += not same
+                    line += f' {t_pil:9.3f} {t_pil / t_ours:7.1f}x  {"yes" if same else "NO"}'
+                print(line)
+    if mismatches:
+        print(f'{mismatches} result(s) differ from PIL')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
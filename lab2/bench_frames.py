@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from PIL import Image, ImageChops
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Общий модуль instrument лежит в корне репозитория
+sys.path.append(os.path.dirname(HERE))
+VARIANTS = ('list', 'stream')
+
+
+def make_animation(path, frames, megapixels):
+    # Кадры - тестовое изображение, сдвигаемое по кругу. Тоже потоком:
+    # ru_maxrss дочернего процесса начинается с пика родителя
+    from frames import save_frames
+    src = Image.open(os.path.join(HERE, 'test_images', 'Test8.webp')).convert('RGB')
+    scale = (megapixels * 1e6 / (src.width * src.height)) ** 0.5
+    src = src.resize((int(src.width * scale), int(src.height * scale)), Image.BICUBIC)
+    seq = ((ImageChops.offset(src, i * src.width // frames, 0), 40) for i in range(frames))
+    save_frames(path, seq, frames, loop=0)
+
+
+def run_list(path, out, chain, workers):
+    # Как обычно делают: все кадры в список, обработать, сохранить списком
+    from frames import run_chain
+    from PIL import ImageSequence
+    with Image.open(path) as im:
+        frames = [run_chain(f.convert('RGB'), chain) for f in ImageSequence.Iterator(im)]
+    frames[0].save(out, save_all=True, append_images=frames[1:], duration=40, loop=0)
+    return len(frames)
+
+
+def run_stream(path, out, chain, workers):
+    from frames import frame_info, iter_frames, process_frames, run_chain, save_frames
+    n, loop = frame_info(path)
+    return save_frames(out, process_frames(iter_frames(path), run_chain, chain, workers), n, loop=loop)
+
+
+def measure(variant, path, chain, workers, ext):
+    out = os.path.splitext(path)[0] + f'_{variant}.{ext}'
+    t0 = time.perf_counter()
+    n = (run_list if variant == 'list' else run_stream)(path, out, chain, workers)
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak *= 1024
+    print(json.dumps({'variant': variant, 'frames': n, 'peak_rss': peak, 'seconds': elapsed}))
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Peak RSS of animation processing: frame list vs stream')
+    ap.add_argument('--frames', type=int, nargs='+', default=[10, 40])
+    ap.add_argument('--megapixels', type=float, default=1.0, help='frame size')
+    ap.add_argument('--op', default='median:3', help='min:N, median:N, max:N or threshold:T')
+    ap.add_argument('--workers', type=int, default=None)
+    ap.add_argument('--format', choices=('webp', 'gif', 'tiff'), default='webp', help='output format')
+    ap.add_argument('--variant', choices=VARIANTS, help=argparse.SUPPRESS)
+    ap.add_argument('--anim', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    name, _, arg = args.op.partition(':')
+    chain = ((name, int(arg)),)
+    if args.variant:
+        measure(args.variant, args.anim, chain, args.workers, args.format)
+        return
+
+    print(f'{args.megapixels:.1f} MP frames, {args.op}, WebP -> {args.format}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for frames in args.frames:
+            anim = os.path.join(tmp, f'anim{frames}.webp')
+            make_animation(anim, frames, args.megapixels)
+            line = []
+            # Каждый вариант в отдельном процессе: ru_maxrss - пик за всю жизнь процесса
+            for variant in VARIANTS:
+                cmd = [sys.executable, os.path.abspath(__file__), '--variant', variant, '--anim', anim, '--op', args.op,
+                       '--format', args.format]
+                if args.workers:
+                    cmd += ['--workers', str(args.workers)]
+                out = subprocess.run(cmd, capture_output=True, text=True, check=True, cwd=HERE)
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                line.append(f'{variant} {r["peak_rss"] / 2**20:7.1f} MB {r["seconds"]:6.2f} s')
+            print(f'    {frames:>4} frames:  ' + '   '.join(line))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Общий модуль instrument лежит в корне репозитория
+sys.path.append(os.path.dirname(HERE))
+
+from PIL import Image
+from display import fit_size
+from loader import LazyImage
+
+FORMATS = {'jpeg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}
+
+
+def first_pixel_eager(path, canvas):
+    # Как было: полное декодирование в RGB, потом уменьшение под холст
+    t0 = time.perf_counter()
+    img = Image.open(path).convert('RGB')
+    img.resize(fit_size(img.width, img.height, *canvas), Image.LANCZOS)
+    return time.perf_counter() - t0
+
+
+def first_pixel_lazy(path, canvas):
+    t0 = time.perf_counter()
+    lazy = LazyImage(path, canvas)
+    # open - сколько стоит поток окна; без превью первая картинка - полное
+    # изображение из фона
+    opened = time.perf_counter() - t0
+    preview = lazy.preview or lazy.full()
+    preview.resize(fit_size(preview.width, preview.height, *canvas), Image.LANCZOS)
+    first = time.perf_counter() - t0
+    lazy.full()
+    return first, time.perf_counter() - t0, lazy.source, opened
+
+
+def best(fn, repeat):
+    runs = [fn() for _ in range(repeat)]
+    return min(runs, key=lambda r: r[0] if isinstance(r, tuple) else r)
+
+
+def bench(path, canvas, repeat):
+    w, h = Image.open(path).size
+    eager = best(lambda: first_pixel_eager(path, canvas), repeat)
+    first, full, source, opened = best(lambda: first_pixel_lazy(path, canvas), repeat)
+    print(f'{os.path.basename(path):<16} {w:>5}x{h:<5} {eager * 1000:9.1f} {opened * 1000:9.1f} {first * 1000:9.1f} '
+          f'{full * 1000:9.1f}  {source:<5} x{eager / first:.1f}')
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Time to first pixel: full decode vs draft/EXIF preview')
+    ap.add_argument('--canvas', type=int, nargs=2, default=(700, 850), metavar=('W', 'H'))
+    ap.add_argument('--megapixels', type=float, default=24.0,
+                    help='also test upscaled copies of this size in every format (0 - skip)')
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+    canvas = tuple(args.canvas)
+
+    print(f'canvas {canvas[0]}x{canvas[1]}; times in ms')
+    print(f'{"file":<16} {"size":^11} {"eager":>9} {"open":>9} {"preview":>9} {"full":>9}  source')
+    folder = os.path.join(HERE, 'test_images')
+    for name in sorted(os.listdir(folder)):
+        bench(os.path.join(folder, name), canvas, args.repeat)
+
+    if args.megapixels > 0:
+        src = Image.open(os.path.join(folder, 'Test8.webp')).convert('RGB')
+        scale = (args.megapixels * 1e6 / (src.width * src.height)) ** 0.5
+        big = src.resize((int(src.width * scale), int(src.height * scale)), Image.BICUBIC)
+        with tempfile.TemporaryDirectory() as tmp:
+            for ext, fmt in FORMATS.items():
+                path = os.path.join(tmp, f'large.{ext}')
+                big.save(path, fmt)
+                bench(path, canvas, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
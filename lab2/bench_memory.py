@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from PIL import Image, ImageOps
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Общий модуль instrument лежит в корне репозитория
+sys.path.append(os.path.dirname(HERE))
+VARIANTS = ('rgb', 'compact')
+
+
+def make_scan(path, megapixels):
+    # Серый "скан": тестовое изображение, замощённое до нужного размера
+    tile = Image.open(os.path.join(HERE, 'test_images', 'Test8.webp')).convert('L')
+    n = max(1, round((megapixels * 1e6 / (tile.width * tile.height)) ** 0.5))
+    scan = Image.new('L', (tile.width * n, tile.height * n))
+    for y in range(n):
+        for x in range(n):
+            scan.paste(tile, (x * tile.width, y * tile.height))
+    scan.save(path)
+
+
+def run_rgb(path, t, size):
+    # Как было: всё в RGB, маска 0/255 тоже переводится в RGB
+    img = Image.open(path).convert('RGB')
+    arr = np.array(ImageOps.grayscale(img))
+    mask = Image.fromarray((arr > t).astype(np.uint8) * 255).convert('RGB')
+    del arr
+    from rank_filters import rank_filter
+    filtered = rank_filter(img, 'min', size)
+    return [img, mask, filtered]
+
+
+def run_compact(path, t, size):
+    from history import History, OpCache
+    from loader import open_image
+    img = open_image(path)
+    history = History(img, OpCache())
+    mask = history.result((('threshold', t),))
+    filtered = history.result((('min', size),))
+    return [img, mask, filtered, history]
+
+
+def measure(variant, path, t, size):
+    t0 = time.perf_counter()
+    kept = (run_rgb if variant == 'rgb' else run_compact)(path, t, size)
+    elapsed = time.perf_counter() - t0
+    modes = [k.mode for k in kept if isinstance(k, Image.Image)]
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak *= 1024
+    print(json.dumps({'variant': variant, 'peak_rss': peak, 'seconds': elapsed, 'modes': modes}))
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Peak RSS: RGB everywhere vs native L/1 modes')
+    ap.add_argument('--megapixels', type=float, default=60.0)
+    ap.add_argument('--threshold', type=int, default=128)
+    ap.add_argument('--size', type=int, default=5)
+    ap.add_argument('--variant', choices=VARIANTS, help=argparse.SUPPRESS)
+    ap.add_argument('--scan', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.variant:
+        measure(args.variant, args.scan, args.threshold, args.size)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scan = os.path.join(tmp, 'scan.png')
+        make_scan(scan, args.megapixels)
+        w, h = Image.open(scan).size
+        print(f'grayscale scan {w}x{h} ({w * h / 1e6:.1f} MP); threshold {args.threshold}, min filter {args.size}')
+        results = {}
+        # Каждый вариант в отдельном процессе: ru_maxrss - пик за всю жизнь процесса
+        for variant in VARIANTS:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--variant', variant, '--scan', scan,
+                                  '--threshold', str(args.threshold), '--size', str(args.size)],
+                                 capture_output=True, text=True, check=True, cwd=HERE)
+            results[variant] = json.loads(out.stdout.strip().splitlines()[-1])
+    for variant, r in results.items():
+        print(f'    {variant:<8} peak RSS {r["peak_rss"] / 2**20:8.1f} MB  {r["seconds"]:6.2f} s  modes {", ".join(r["modes"])}')
+    print(f'    peak RSS ratio x{results["rgb"]["peak_rss"] / results["compact"]["peak_rss"]:.2f}')
+
+
+if __name__ == '__main__':
+    main()
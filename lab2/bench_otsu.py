@@ -0,0 +1,100 @@
+import argparse
+import glob
+import os
+import time
+import numpy as np
+from PIL import Image, ImageOps
+from threshold import gray_histogram, multi_otsu, otsu_batch, otsu_from_histogram
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def otsu_loop(hist):
+    # Прежняя реализация: проход по 256 корзинам в цикле Python
+    total = hist.sum()
+    sum_total = (np.arange(256) * hist).sum()
+    weight_bg = 0.0
+    sum_bg = 0.0
+    var_max = 0.0
+    thresh = 0
+    for i in range(256):
+        weight_bg += hist[i]
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * hist[i]
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_total - sum_bg) / weight_fg
+        var_between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if var_between > var_max:
+            var_max = var_between
+            thresh = i
+    return int(thresh)
+
+
+def multi_levels(hist, m):
+    return ','.join(map(str, multi_otsu(hist, m)))
+
+
+def per_call(func, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - t0) / n
+
+
+def random_histograms(n, rng):
+    # Разные формы: редкие пики, шум, большие счётчики, равномерные
+    hists = np.zeros((n, 256), dtype=np.int64)
+    for k in range(n):
+        kind = k % 4
+        if kind == 0:
+            hists[k, rng.integers(0, 256, rng.integers(1, 4))] = rng.integers(1, 1000)
+        elif kind == 1:
+            hists[k] = rng.integers(0, 3, 256)
+        elif kind == 2:
+            hists[k] = rng.integers(0, 10**9, 256) * (rng.random(256) < 0.1)
+        else:
+            hists[k] = rng.poisson(rng.random() * 50, 256)
+    return hists
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Otsu: Python loop vs vectorized, batched and multi-level')
+    ap.add_argument('--random', type=int, default=2000, help='random histograms checked against the loop')
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    hists = []
+    print('test images: threshold (loop / vectorized), multi-level 2..4')
+    for path in sorted(glob.glob(os.path.join(HERE, 'test_images', '*'))):
+        hist = gray_histogram(ImageOps.grayscale(Image.open(path).convert('RGB')))
+        hists.append(hist)
+        levels = ' | '.join(multi_levels(hist, m) for m in (2, 3, 4))
+        print(f'    {os.path.basename(path):<12} {otsu_loop(hist):>3} / {otsu_from_histogram(hist):<3}  {levels}')
+    hists = np.concatenate([np.array(hists), random_histograms(args.random, rng)])
+    ref = np.array([otsu_loop(h) for h in hists])
+    got = otsu_batch(hists)
+    print(f'{len(hists)} histograms: {np.count_nonzero(ref != got)} mismatch(es) with the loop')
+
+    img = ImageOps.grayscale(Image.open(sorted(glob.glob(os.path.join(HERE, 'test_images', '*')))[-1]).convert('RGB'))
+    h = gray_histogram(img)
+    t_loop = per_call(lambda: otsu_loop(h), 50)
+    t_vec = per_call(lambda: otsu_from_histogram(h), 500)
+    t_batch = per_call(lambda: otsu_batch(hists), 5) / len(hists)
+    print(f'single threshold: loop {t_loop * 1e6:.1f} us, vectorized {t_vec * 1e6:.1f} us '
+          f'(x{t_loop / t_vec:.0f}), batched {t_batch * 1e6:.2f} us per histogram')
+    for m in (2, 3, 4):
+        print(f'multi-level, {m} thresholds: {per_call(lambda: multi_otsu(h, m), 20) * 1e3:.2f} ms')
+
+    t_hist = per_call(lambda: gray_histogram(img), 20)
+    t_ravel = per_call(lambda: np.histogram(np.array(img).ravel(), bins=256, range=(0, 256)), 20)
+    print(f'histogram of {img.width}x{img.height}: Image.histogram {t_hist * 1e3:.2f} ms, '
+          f'np.histogram on a raveled copy {t_ravel * 1e3:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
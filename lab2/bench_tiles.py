@@ -0,0 +1,59 @@
+import argparse
+import glob
+import os
+import time
+from PIL import Image
+from tiles import TILE, cpu_count, get_pool, run_tiled, _process_block
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def big_image(path, megapixels):
+    # Тестовое изображение, замощённое до нужного размера
+    img = Image.open(path).convert('RGB')
+    scale = (megapixels * 1e6 / (img.width * img.height)) ** 0.5
+    nx, ny = max(1, round(scale)), max(1, round(scale))
+    out = Image.new('RGB', (img.width * nx, img.height * ny))
+    for y in range(ny):
+        for x in range(nx):
+            out.paste(img, (x * img.width, y * img.height))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Tiled multi-core processing: scaling from 1 to N workers')
+    ap.add_argument('--image', default=sorted(glob.glob(os.path.join(HERE, 'test_images', '*')))[-1])
+    ap.add_argument('--megapixels', type=float, default=40.0)
+    ap.add_argument('--ops', default='min:21,median:9,max:3,threshold:128')
+    ap.add_argument('--workers', type=int, default=cpu_count(), help='maximum number of processes')
+    ap.add_argument('--tile', type=int, default=TILE)
+    ap.add_argument('--no-check', action='store_true', help='skip the single-shot reference')
+    args = ap.parse_args()
+    img = big_image(args.image, args.megapixels)
+    mp = img.width * img.height / 1e6
+    print(f'{os.path.basename(args.image)} tiled to {img.width}x{img.height} ({mp:.1f} MP), '
+          f'tile {args.tile}, {cpu_count()} cpu(s) available')
+    for w in range(2, args.workers + 1):
+        get_pool(w)
+
+    for spec in args.ops.split(','):
+        op, arg = spec.split(':')
+        arg = int(arg)
+        line = f'{op}:{arg}'
+        if not args.no_check:
+            t0 = time.perf_counter()
+            ref = _process_block(img, op, arg)
+            line += f'  single shot {time.perf_counter() - t0:.2f} s'
+        print(line)
+        base = None
+        for workers in range(1, args.workers + 1):
+            t0 = time.perf_counter()
+            out = run_tiled(img, op, arg, workers, args.tile)
+            t = time.perf_counter() - t0
+            base = base or t
+            same = '' if args.no_check else ('  identical' if out.tobytes() == ref.tobytes() else '  DIFFERENT')
+            print(f'    {workers:>2} worker(s) {t:7.2f} s  {mp / t:7.1f} MP/s  speedup x{base / t:.2f}{same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import weakref
+from collections import OrderedDict
+from PIL import Image
+
+# Сколько исходных изображений держать (оригинал, результат, серое) и
+# сколько готовых размеров на каждое
+SOURCES = 4
+SIZES_PER_SOURCE = 2
+
+
+def fit_size(iw, ih, cw, ch):
+    scale_w = cw / iw
+    scale_h = ch / ih
+    scale = min(scale_w, scale_h, 1.0)  # никогда не превышаем размер холста
+    # Дополнительно: если изображение слишком маленькое, увеличим его минимум в 2 раза, но не больше холста
+    if iw * scale < cw * 0.5 or ih * scale < ch * 0.5:
+        scale = min(max(scale, 2.0), min(scale_w, scale_h))
+    return max(1, int(iw * scale)), max(1, int(ih * scale))
+
+
+class DisplayCache:
+    # Уменьшенные копии для холстов. Ключ - само изображение (identity)
+    # и размер; LANCZOS идёт от ближайшего уровня пирамиды reduce(2),
+    # который ещё не меньше нужного размера. Исходник держится слабой
+    # ссылкой: запись живёт, пока изображение нужно кому-то ещё, и
+    # удаляется вместе с ним. Свои копии исходника запись не хранит
+    def __init__(self, capacity=SOURCES):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, key, ref):
+        # Колбэк weakref; id мог уже достаться новому изображению
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is ref:
+            del self.entries[key]
+
+    def _entry(self, img):
+        key = id(img)
+        entry = self.entries.get(key)
+        if entry is None or entry[0]() is not img:
+            ref = weakref.ref(img, lambda r, key=key: self._drop(key, r))
+            # Маски и палитры для показа - в L: их не уменьшить фильтром.
+            # Уровень 0 - сам img, в записи только то, что из него построено
+            gray = img.convert('L') if img.mode in ('1', 'P') else None
+            entry = (ref, gray, [], OrderedDict())
+            self.entries[key] = entry
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        self.entries.move_to_end(key)
+        return entry
+
+    def get(self, img, size):
+        _, gray, reduced, fitted = self._entry(img)
+        base = img if gray is None else gray
+        if base.size == size:
+            return base
+        out = fitted.get(size)
+        if out is not None:
+            fitted.move_to_end(size)
+            self.hits += 1
+            return out
+        self.misses += 1
+        w, h = size
+        levels = [base] + reduced
+        while levels[-1].width // 2 >= w and levels[-1].height // 2 >= h:
+            levels.append(levels[-1].reduce(2))
+            reduced.append(levels[-1])
+        src = base
+        for level in reversed(levels):
+            if level.width >= w and level.height >= h:
+                src = level
+                break
+        out = src.resize(size, Image.LANCZOS) if src.size != size else src
+        fitted[size] = out
+        if len(fitted) > SIZES_PER_SOURCE:
+            fitted.popitem(last=False)
+        return out
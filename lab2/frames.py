@@ -0,0 +1,120 @@
+import os
+from collections import deque
+from PIL import Image
+from history import run_op
+from loader import native
+from rank_filters import PLANE_FILTERS, rank_filter
+from tiles import cpu_count, get_pool
+
+# Форматы, которые Pillow пишет за один проход по кадрам. APNG сначала
+# перебирает все кадры ради общего режима и размера - из потока так нельзя
+STREAM_FORMATS = ('WEBP', 'GIF', 'TIFF')
+SEEK_FORMATS = ('WEBP', 'TIFF')
+
+
+def frame_info(path):
+    # Число кадров и повторов (0 - бесконечно, None - не указано)
+    with Image.open(path) as im:
+        return getattr(im, 'n_frames', 1), im.info.get('loop')
+
+
+def iter_frames(path):
+    # Кадры по одному, строго подряд: seek назад заставил бы декодер
+    # начинать с первого кадра. Отдаёт (кадр, длительность в мс)
+    with Image.open(path) as im:
+        for i in range(getattr(im, 'n_frames', 1)):
+            im.seek(i)
+            yield native(im), im.info.get('duration', 0)
+
+
+def run_chain(img, chain):
+    # Цепочка операций истории на одном кадре. Кадр и так обрабатывается
+    # в процессе пула, поэтому фильтры - без разбиения на тайлы
+    for op in chain:
+        img = rank_filter(img, op[0], op[1]) if op[0] in PLANE_FILTERS else run_op(img, op)
+    return img
+
+
+def process_frames(frames, fn, arg, workers=None, inflight=None):
+    # fn(кадр, arg) в пуле процессов; в работе не больше inflight кадров,
+    # результаты - в исходном порядке. workers=1 - в этом же процессе
+    workers = workers or cpu_count()
+    if workers == 1:
+        for frame, duration in frames:
+            yield fn(frame, arg), duration
+        return
+    inflight = inflight or 2 * workers
+    pool = get_pool(workers)
+    pending = deque()
+    for frame, duration in frames:
+        if len(pending) >= inflight:
+            fut, d = pending.popleft()
+            yield fut.result(), d
+        pending.append((pool.submit(fn, frame, arg), duration))
+    while pending:
+        fut, d = pending.popleft()
+        yield fut.result(), d
+
+
+def seek_frames(first, rest, n_frames):
+    # Для писателей, которые сами делают list(append_images): копия первого
+    # кадра с n_frames, где seek(i) вклеивает (paste) в неё следующий кадр
+    # из генератора. Так в памяти всегда один кадр. Это не публичный API:
+    # расчёт на то, что _save_all у WebP и TIFF обходит кадры через
+    # n_frames и seek(i) по порядку (проверено на Pillow 12). Если писатель
+    # обойдёт их иначе, save_frames сообщит об ошибке, а не запишет часть
+    canvas = first.copy()
+    pos = [0]
+
+    def seek(frame):
+        if frame >= n_frames:
+            raise EOFError('no more frames')
+        if frame < pos[0]:
+            # save() в конце возвращает позицию на начало - после
+            # последнего кадра это уже ничего не значит
+            if pos[0] == n_frames - 1:
+                return
+            raise ValueError('frame stream cannot seek back')
+        while pos[0] < frame:
+            img = next(rest)
+            canvas.paste(img if img.mode == canvas.mode else img.convert(canvas.mode))
+            pos[0] += 1
+
+    canvas.n_frames = n_frames
+    canvas.seek = seek
+    canvas.tell = lambda: pos[0]
+    return canvas
+
+
+def stream_format(path):
+    return Image.registered_extensions().get(os.path.splitext(path)[1].lower())
+
+
+def save_frames(path, frames, n_frames, format=None, loop=None, **params):
+    # Кодирование по мере поступления кадров. GIF берёт append_images
+    # итератором, но сам копит кадры в палитре (байт на пиксель); WebP и
+    # TIFF превращают append_images в список - им кадры идут через seek.
+    # loop=None - не указывать (у GIF без loop анимация проигрывается один раз)
+    fmt = format or stream_format(path)
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f'{fmt} cannot be written frame by frame; use WebP, GIF or TIFF')
+    frames = iter(frames)
+    first, duration = next(frames)
+    # Список дополняется по мере чтения кадров: писатель берёт
+    # duration[i] уже после того, как получил кадр i
+    durations = [duration]
+
+    def rest():
+        for frame, d in frames:
+            durations.append(d)
+            yield frame
+
+    if loop is not None:
+        params['loop'] = loop
+    if fmt in SEEK_FORMATS:
+        seek_frames(first, rest(), n_frames).save(path, format=fmt, save_all=True, duration=durations, **params)
+        if len(durations) != n_frames:
+            raise RuntimeError(f'{fmt} writer took {len(durations)} of {n_frames} frames')
+    else:
+        first.save(path, format=fmt, save_all=True, append_images=rest(), duration=durations, **params)
+    return len(durations)
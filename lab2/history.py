@@ -0,0 +1,183 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import ImageOps
+from adaptive import AdaptiveThreshold
+from instrument import span
+from threshold import binarize, pack_mask, unpack_mask
+from tiles import check, filter_image
+
+CACHE_BYTES = 1 << 30
+
+
+def image_bytes(img):
+    if isinstance(img, tuple):
+        return img[0].nbytes
+    return img.width * img.height * len(img.getbands())
+
+
+def source_key(img):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{img.mode} {img.width}x{img.height}'.encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def run_op(img, op, cancel=None):
+    # op - кортеж (имя, параметры...):
+    # ('min' | 'median' | 'max', size), ('threshold', t), ('adaptive', method, size, k)
+    # cancel (threading.Event) прерывает фильтр между тайлами или полосами
+    name = op[0]
+    with span(name, op=op[1:]):
+        if name == 'threshold':
+            return binarize(img, op[1])
+        if name == 'adaptive':
+            return AdaptiveThreshold(ImageOps.grayscale(img)).apply(*op[1:])
+        return filter_image(img, name, op[1], cancel=cancel)
+
+
+class OpCache:
+    # Промежуточные результаты по ключу (хеш исходника, цепочка операций),
+    # LRU с ограничением по байтам. Общий для GUI-потока и фонового.
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, count=True):
+        # count=False - проба без записи в статистику
+        with self.lock:
+            img = self.items.get(key)
+            if img is None:
+                if count:
+                    self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            if count:
+                self.hits += 1
+        return unpack_mask(img) if isinstance(img, tuple) else img
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def peek(self, key):
+        with self.lock:
+            return self.items.get(key) is not None
+
+    def put(self, key, img):
+        # Маски '1' хранятся упакованными по 8 пикселей в байт
+        if img.mode == '1':
+            img = pack_mask(img)
+        size = image_bytes(img)
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.bytes -= image_bytes(old)
+            if size > self.max_bytes:
+                return
+            self.items[key] = img
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.items.popitem(last=False)
+                self.bytes -= image_bytes(evicted)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'items': len(self.items), 'bytes': self.bytes}
+
+
+class History:
+    # Состояния - цепочки операций от исходного изображения. Переход по
+    # undo/redo берёт результат из кэша; если он вытеснен, досчитывается
+    # от самого длинного закэшированного префикса.
+    def __init__(self, source, cache):
+        self.source = source
+        self.key = source_key(source)
+        self.cache = cache
+        self.states = [()]
+        self.pos = 0
+
+    @property
+    def chain(self):
+        return self.states[self.pos]
+
+    def cached(self, chain):
+        return not chain or self.cache.peek((self.key, chain))
+
+    def lookup(self, chain):
+        # Только из кэша, без пересчёта; None - результата там нет. Промах
+        # не считается: за ним следует result() или расчёт на месте
+        if not chain:
+            return self.source
+        img = self.cache.get((self.key, chain), count=False)
+        if img is not None:
+            self.cache.count(True)
+        return img
+
+    def result(self, chain=None, cancel=None):
+        # cancel - для фонового потока: после set() расчёт обрывается с
+        # CancelledError; готовые шаги остаются в кэше
+        chain = self.chain if chain is None else chain
+        if not chain:
+            return self.source
+        # Один get на шаг: между peek и get фоновый поток мог бы вытеснить запись
+        n = len(chain)
+        img = None
+        while n:
+            img = self.cache.get((self.key, chain[:n]), count=False)
+            if img is not None:
+                break
+            n -= 1
+        # В статистику - одна запись на вызов: попадание, только если
+        # найдена вся цепочка, а не префикс
+        self.cache.count(n == len(chain))
+        if n == len(chain):
+            return img
+        if img is None:
+            img = self.source
+        for i in range(n, len(chain)):
+            check(cancel)
+            img = run_op(img, chain[i], cancel)
+            self.cache.put((self.key, chain[:i + 1]), img)
+        return img
+
+    def store(self, chain, img):
+        if chain:
+            self.cache.put((self.key, chain), img)
+
+    def push(self, chain):
+        # Новое состояние; всё, что было для redo, отбрасывается
+        if chain == self.chain:
+            return chain
+        del self.states[self.pos + 1:]
+        self.states.append(chain)
+        self.pos += 1
+        return chain
+
+    def replace(self, chain):
+        # Подстройка последней операции (ползунок) - без нового шага истории.
+        # Состояния для redo построены на старом значении - отбрасываются
+        if chain == self.chain:
+            return chain
+        self.states[self.pos] = chain
+        del self.states[self.pos + 1:]
+        return chain
+
+    def undo(self):
+        if self.pos == 0:
+            return None
+        self.pos -= 1
+        return self.chain
+
+    def redo(self):
+        if self.pos + 1 >= len(self.states):
+            return None
+        self.pos += 1
+        return self.chain
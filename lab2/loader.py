@@ -0,0 +1,87 @@
+import io
+from concurrent.futures import Future, ThreadPoolExecutor
+from PIL import ExifTags, Image
+from instrument import span
+
+# Одноканальные изображения так и остаются одноканальными
+NATIVE_MODES = ('1', 'L')
+GRAY_MODES = ('I;16', 'I;16B', 'I', 'F', 'LA', 'La')
+# Теги IFD1 со смещением и длиной JPEG-миниатюры
+THUMB_OFFSET, THUMB_LENGTH = 0x0201, 0x0202
+# Без draft/миниатюры изображение до этого размера декодируется сразу,
+# большее - только в фоне
+INLINE_PIXELS = 1_000_000
+
+_decoder = ThreadPoolExecutor(max_workers=1)
+
+
+def native(im):
+    if im.mode in NATIVE_MODES:
+        return im.copy()
+    return im.convert('L' if im.mode in GRAY_MODES else 'RGB')
+
+
+def open_image(path):
+    with span('decode'), Image.open(path) as im:
+        return native(im)
+
+
+def exif_thumbnail(im):
+    # Миниатюра из EXIF (IFD1) - JPEG внутри блока APP1, смещения от
+    # начала TIFF-заголовка, который идёт после "Exif\0\0"
+    raw = im.info.get('exif')
+    if not raw:
+        return None
+    try:
+        ifd1 = im.getexif().get_ifd(ExifTags.IFD.IFD1)
+        start, length = ifd1[THUMB_OFFSET] + 6, ifd1[THUMB_LENGTH]
+        thumb = Image.open(io.BytesIO(raw[start:start + length]))
+        return native(thumb)
+    except Exception:
+        return None
+
+
+def read_preview(im, size):
+    # Самый дешёвый способ получить картинку не меньше size:
+    # EXIF-миниатюра, иначе JPEG с масштабированием в DCT (draft).
+    # Возвращает (превью или None, откуда, полное изображение или None)
+    if im.format == 'JPEG':
+        thumb = exif_thumbnail(im)
+        if thumb is not None and thumb.width >= min(size[0], im.width) and thumb.height >= min(size[1], im.height):
+            return thumb, 'exif', None
+        # Если уменьшать в DCT нечего, превью и есть полное изображение
+        if im.mode in ('RGB', 'L'):
+            full_size = im.size
+            im.draft(im.mode, size)
+            if im.size != full_size:
+                return native(im), 'draft', None
+    # Остальные форматы так не умеют: уменьшенная копия стоила бы полного
+    # декодирования. Большое изображение декодируется только в фоне, а до
+    # тех пор превью нет
+    if im.width * im.height > INLINE_PIXELS:
+        return None, 'none', None
+    full = native(im)
+    return full, 'full', full
+
+
+class LazyImage:
+    # Сначала превью под размер холста (если его можно получить дёшево),
+    # полное декодирование - в фоне; full() ждёт его, если оно ещё идёт
+    def __init__(self, path, preview_size):
+        self.path = path
+        with Image.open(path) as im:
+            self.size = im.size
+            self.format = im.format
+            self.n_frames = getattr(im, 'n_frames', 1)
+            self.preview, self.source, full = read_preview(im, preview_size)
+        if full is not None:
+            self.future = Future()
+            self.future.set_result(full)
+        else:
+            self.future = _decoder.submit(open_image, path)
+
+    def done(self):
+        return self.future.done()
+
+    def full(self):
+        return self.future.result()
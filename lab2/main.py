@@ -1,11 +1,33 @@
+import argparse
 import os
 import sys
+
+if __name__ == '__main__':
+    # Запуск файлом (python lab2/main.py): общий модуль instrument лежит в
+    # корне репозитория. python -m lab2 задаёт путь в __main__.py
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import subprocess
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk, ImageFilter, ImageOps
+from PIL import ImageTk, ImageOps
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from rank_filters import PLANE_FILTERS, rank_filter
+from display import DisplayCache, fit_size
+from threshold import otsu_from_histogram, threshold_lut
+from adaptive import DEFAULT_K, METHODS, AdaptiveThreshold
+from history import CACHE_BYTES, History, OpCache
+from loader import LazyImage
+import instrument
+from instrument import span
+from frames import STREAM_FORMATS, frame_info, iter_frames, process_frames, run_chain, save_frames, stream_format
+
+FRAME_MS = 16
+RESIZE_MS = 50
+RENDER_POLL_MS = 30
 
 def shutil_which(cmd):
     try:
@@ -71,40 +93,57 @@ def system_file_picker_image(initialdir=None, title="Select image"):
 
     return None
 
-def otsu_threshold(grayscale_image):
-    arr = np.array(grayscale_image).ravel()
-    hist, _ = np.histogram(arr, bins=256, range=(0, 256))
-    total = arr.size
-    sum_total = (np.arange(256) * hist).sum()
-    weight_bg = 0.0
-    sum_bg = 0.0
-    var_max = 0.0
-    thresh = 0
-    for i in range(256):
-        weight_bg += hist[i]
-        if weight_bg == 0:
-            continue
-        weight_fg = total - weight_bg
-        if weight_fg == 0:
-            break
-        sum_bg += i * hist[i]
-        mean_bg = sum_bg / weight_bg
-        mean_fg = (sum_total - sum_bg) / weight_fg
-        var_between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
-        if var_between > var_max:
-            var_max = var_between
-            thresh = i
-    return int(thresh)
-
 class App:
-    def __init__(self, root):
+    def __init__(self, root, cache_bytes=CACHE_BYTES):
         self.root = root
         self.root.title("Image Filters")
         self.root.geometry("1400x900")
         self.original = None
         self.processed = None
+        # Открываемое изображение: пока полное декодируется в фоне,
+        # на холстах его превью
+        self.loading = None
+        # Файл-источник и число кадров в нём: анимация показывается первым
+        # кадром, а при сохранении обрабатывается целиком
+        self.source_path = None
+        self.n_frames = 1
+        self.saving = None
         self.photo_original = None
         self.photo_processed = None
+        self.display = DisplayCache()
+        # Что сейчас показано на холсте: (картинка, ширина, высота)
+        self.shown = {'orig': None, 'proc': None}
+        self.resize_jobs = {}
+        # Серое изображение и его гистограмма - считаются один раз для
+        # того изображения (gray_src), к которому применяется порог
+        self.gray = None
+        self.gray_hist = None
+        self.gray_src = None
+        # Порог, которым получен processed (None - результат фильтра);
+        # полноразмерная бинаризация делается только при сохранении
+        self.thresh_level = None
+        self.thresh_job = None
+        # Фильтр на полном разрешении считается в фоне; пока он идёт,
+        # показывается proxy - тот же фильтр на копии размером с холст
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        self.render = None
+        self.render_chain = None
+        self.render_cancel = None
+        self.proxy = None
+        # Ожидание результата родительской цепочки: (цепочка, future,
+        # продолжение, флаг отмены). В GUI-потоке она не пересчитывается
+        self.pending = None
+        # Сохранение анимации - в своём потоке, чтобы не стоять в очереди
+        # за рендером и не задерживать новые
+        self.saver = ThreadPoolExecutor(max_workers=1)
+        # Цепочка операций от original с кэшем промежуточных результатов
+        self.op_cache = OpCache(cache_bytes)
+        self.history = None
+        # Интегральные изображения для локального порога (для какого
+        # изображения, движок); live - результат следует за k и размером
+        self.adaptive = None
+        self.adaptive_live = False
+        self.adaptive_job = None
         pictures = os.path.expanduser("~/Pictures")
         self.last_dir = pictures if os.path.isdir(pictures) else os.path.expanduser("~")
         self._build_ui()
@@ -115,7 +154,7 @@ class App:
         tk.Button(left, text="Open", width=14, command=self.open_native).pack(pady=6)
         tk.Label(left, text="Size").pack()
         self.size_var = tk.IntVar(value=3)
-        self.size_scale = tk.Scale(left, from_=3, to=21, orient='horizontal', resolution=2, variable=self.size_var, length=140)
+        self.size_scale = tk.Scale(left, from_=3, to=21, orient='horizontal', resolution=2, variable=self.size_var, length=140, command=self._on_adaptive_change)
         self.size_scale.pack(pady=4)
         tk.Label(left, text="Filters").pack(pady=(6,0))
         tk.Button(left, text="Min", width=14, command=lambda: self.apply('min')).pack(pady=4)
@@ -126,16 +165,32 @@ class App:
         self.thresh_scale = tk.Scale(left, from_=0, to=255, orient='horizontal', variable=self.thresh_var, length=140, command=self._on_thresh_change)
         self.thresh_scale.pack(pady=4)
         tk.Button(left, text="Otsu", width=14, command=self.threshold_otsu).pack(pady=(6,4))
-        tk.Button(left, text="Reset", width=14, command=self.reset).pack(pady=(12,4))
+        tk.Label(left, text="Adaptive").pack(pady=(8,0))
+        self.method_var = tk.StringVar(value=METHODS[0])
+        tk.OptionMenu(left, self.method_var, *METHODS, command=self._on_method_change).pack(pady=4)
+        self.k_var = tk.DoubleVar(value=DEFAULT_K[METHODS[0]])
+        tk.Scale(left, from_=-1.0, to=1.0, orient='horizontal', resolution=0.01, label="k", variable=self.k_var, length=140, command=self._on_adaptive_change).pack(pady=4)
+        tk.Button(left, text="Adaptive", width=14, command=self.apply_adaptive).pack(pady=4)
+        undo_row = tk.Frame(left)
+        undo_row.pack(pady=(12,0))
+        tk.Button(undo_row, text="Undo", width=6, command=self.undo).pack(side=tk.LEFT, padx=2)
+        tk.Button(undo_row, text="Redo", width=6, command=self.redo).pack(side=tk.LEFT, padx=2)
+        self.root.bind('<Control-z>', self.undo)
+        self.root.bind('<Control-y>', self.redo)
+        tk.Button(left, text="Reset", width=14, command=self.reset).pack(pady=(6,4))
         tk.Button(left, text="Save", width=14, command=self.save).pack(pady=4)
+        self.status = tk.Label(left, text="", fg='#666')
+        self.status.pack(pady=(8,0))
+        self.cache_label = tk.Label(left, text="", fg='#666', justify='left')
+        self.cache_label.pack(pady=(4,0))
         right = tk.Frame(self.root, padx=6, pady=6)
         right.pack(side=tk.RIGHT, expand=True, fill=tk.BOTH)
         self.canvas_orig = tk.Canvas(right, bg='#111')
         self.canvas_proc = tk.Canvas(right, bg='#111')
         self.canvas_orig.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
         self.canvas_proc.pack(side=tk.RIGHT, expand=True, fill=tk.BOTH)
-        self.canvas_orig.bind('<Configure>', lambda e: self._redraw())
-        self.canvas_proc.bind('<Configure>', lambda e: self._redraw())
+        self.canvas_orig.bind('<Configure>', lambda e: self._on_resize('orig'))
+        self.canvas_proc.bind('<Configure>', lambda e: self._on_resize('proc'))
 
     def open_native(self):
         path = system_file_picker_image(initialdir=self.last_dir, title="Select image")
@@ -143,113 +198,481 @@ class App:
             path = filedialog.askopenfilename(initialdir=self.last_dir, filetypes=[("Images","*.png;*.jpg;*.jpeg;*.bmp;*.tiff;*.gif")], parent=self.root)
         if not path or not os.path.isfile(path):
             return
+        instrument.event('open')
+        size = (self.canvas_proc.winfo_width(), self.canvas_proc.winfo_height())
         try:
-            img = Image.open(path).convert('RGB')
+            with span('open preview', file=os.path.basename(path)):
+                lazy = LazyImage(path, size)
         except Exception as e:
             messagebox.showerror("Error", str(e))
             return
         self.last_dir = os.path.dirname(path)
-        self.original = img
-        self.processed = img.copy()
+        self._stop_live()
+        self._clear_threshold()
+        self.adaptive = None
+        self.loading = lazy
+        self.source_path = path
+        self.n_frames = lazy.n_frames
+        self.original = self.processed = self.history = None
         self.thresh_var.set(128)
+        if lazy.done():
+            self._finish_loading()
+            return
+        self.status.config(text="Loading full size...")
         self._redraw()
+        self.root.after(RENDER_POLL_MS, self._poll_loading, lazy)
+
+    def _poll_loading(self, lazy):
+        if lazy is not self.loading:
+            return
+        if not lazy.done():
+            self.root.after(RENDER_POLL_MS, self._poll_loading, lazy)
+            return
+        self._finish_loading()
+
+    def _finish_loading(self):
+        # Ждёт полное изображение, если оно ещё декодируется
+        lazy, self.loading = self.loading, None
+        self.status.config(text="")
+        try:
+            with span('wait for full decode'):
+                img = lazy.full()
+        except Exception as e:
+            self._redraw()
+            messagebox.showerror("Error", str(e))
+            return
+        self.original = img
+        self.history = History(img, self.op_cache)
+        self.processed = img
+        self._redraw()
+        self._show_cache_stats()
+
+    def _ensure_original(self):
+        # Операции идут по полному изображению - дожидаемся его
+        if self.loading is not None:
+            self._finish_loading()
+        return self.original is not None
+
+    def _stop_live(self):
+        self._cancel_threshold()
+        self._cancel_render()
+        self.thresh_level = None
+        self.adaptive_live = False
+
+    def _parent(self, name):
+        # Ползунки подстраивают последнюю операцию того же вида, а не
+        # добавляют новый шаг; фильтры всегда добавляются в цепочку
+        chain = self.history.chain
+        if chain and chain[-1][0] == name:
+            return chain[:-1], True
+        return chain, False
+
+    def _commit(self, chain, live):
+        return self.history.replace(chain) if live else self.history.push(chain)
 
     def apply(self, kind):
-        if self.original is None:
+        if not self._ensure_original():
             return
         size = int(self.size_var.get())
         if size < 3 or size % 2 == 0:
             messagebox.showerror("Error", "Odd size >=3 required")
             return
-        if kind == 'min':
-            out = self.original.filter(ImageFilter.MinFilter(size))
-        elif kind == 'median':
-            out = self.original.filter(ImageFilter.MedianFilter(size))
-        elif kind == 'max':
-            out = self.original.filter(ImageFilter.MaxFilter(size))
+        if kind not in PLANE_FILTERS:
+            return
+        instrument.event(kind)
+        parent = self.history.chain
+        self._when_ready(parent, lambda base: self._apply_filter(base, parent, kind, size))
+
+    def _apply_filter(self, base, parent, kind, size):
+        self._stop_live()
+        chain = self.history.push(parent + ((kind, size),))
+        proxy = self._fit_image_to_canvas(base, self.canvas_proc)
+        scale = proxy.width / base.width
+        self.processed = self.history.lookup(chain)
+        if self.processed is None and scale >= 1:
+            # Изображение не больше холста: один фильтр по готовому base
+            self.processed = self.history.result(chain)
+        if self.processed is None:
+            # Ядро в масштабе превью, нечётное; меньше 3 - фильтр не виден
+            k = int(size * scale) | 1
+            with span('filter proxy', kind=kind, size=k):
+                self.proxy = rank_filter(proxy, kind, k) if k >= 3 else proxy
+            self.processed = None
+            self.render, self.render_cancel = self._submit(chain)
+            self.render_chain = chain
+            self.status.config(text="Rendering full size...")
+            self.root.after(RENDER_POLL_MS, self._poll_render, self.render)
+        self._draw_processed()
+        self._show_cache_stats()
+
+    def _submit(self, chain):
+        # Расчёт цепочки в фоне и флаг, по которому он обрывается
+        cancel = threading.Event()
+        return self.worker.submit(self.history.result, chain, cancel), cancel
+
+    def _when_ready(self, chain, then):
+        # then(результат chain) - сразу, если он в кэше. Иначе результат
+        # считается в фоновом потоке (или уже считается там - тогда ждём
+        # тот же рендер), а then вызывается из опроса
+        img = self.history.lookup(chain)
+        if img is not None:
+            then(img)
+            return
+        if self.pending is not None and self.pending[0] == chain:
+            self.pending = (chain, self.pending[1], then, self.pending[3])
+            return
+        if self.render is not None and self.render_chain == chain:
+            # proxy этого рендера остаётся на экране до готовности
+            job, cancel, self.render = self.render, self.render_cancel, None
         else:
+            self._cancel_render()
+            job, cancel = self._submit(chain)
+        self.pending = (chain, job, then, cancel)
+        self.status.config(text="Rendering full size...")
+        self.root.after(RENDER_POLL_MS, self._poll_pending, job)
+
+    def _poll_pending(self, job):
+        if self.pending is None or self.pending[1] is not job:
             return
-        self.processed = out
-        self._redraw()
+        if not job.done():
+            self.root.after(RENDER_POLL_MS, self._poll_pending, job)
+            return
+        self._finish_pending()
+
+    def _finish_pending(self):
+        # Ждёт результат родительской цепочки, если он ещё считается, и
+        # выполняет отложенное действие
+        job, then = self.pending[1], self.pending[2]
+        self.pending = None
+        self.proxy = None
+        self.status.config(text="")
+        try:
+            img = job.result()
+        except Exception as e:
+            self._draw_processed()
+            messagebox.showerror("Error", str(e))
+            return
+        then(img)
+
+    def _poll_render(self, render):
+        if render is not self.render:
+            return
+        if not render.done():
+            self.root.after(RENDER_POLL_MS, self._poll_render, render)
+            return
+        self._finish_render()
+        self._draw_processed()
+
+    def _finish_render(self):
+        # Ждёт фоновый фильтр, если он ещё идёт
+        render, self.render = self.render, None
+        self.proxy = None
+        self.status.config(text="")
+        try:
+            self.processed = render.result()
+        except Exception as e:
+            self.processed = None
+            messagebox.showerror("Error", str(e))
+        self._show_cache_stats()
+
+    def _cancel_render(self):
+        # Не начатый расчёт снимается с очереди, идущий обрывается на
+        # ближайшей проверке флага; готовые шаги цепочки остаются в кэше
+        if self.render is not None:
+            self.render_cancel.set()
+            self.render.cancel()
+            self.render = None
+            self.proxy = None
+            self.status.config(text="")
+        if self.pending is not None:
+            self.pending[3].set()
+            self.pending[1].cancel()
+            self.pending = None
+            self.proxy = None
+            self.status.config(text="")
+
+    def _gray(self, base):
+        # Серое изображение и гистограмма того, к чему применяется порог
+        if self.gray_src is not base:
+            with span('grayscale'):
+                self.gray = ImageOps.grayscale(base)
+                self.gray_hist = np.array(self.gray.histogram())
+            self.gray_src = base
+        return self.gray
+
+    def _gray_for_canvas(self):
+        return self._fit_image_to_canvas(self.gray, self.canvas_proc)
+
+    def _clear_threshold(self):
+        self._cancel_threshold()
+        self.gray = self.gray_hist = self.gray_src = None
+        self.thresh_level = None
+
+    def _cancel_threshold(self):
+        if self.thresh_job is not None:
+            self.root.after_cancel(self.thresh_job)
+            self.thresh_job = None
 
     def _on_thresh_change(self, val):
-        if self.original is None:
+        # Перетаскивание ползунка: не больше одной отрисовки за кадр,
+        # рисуется последнее значение
+        if self.original is None and self.loading is None:
             return
-        v = int(float(val))
-        gray = ImageOps.grayscale(self.original)
-        arr = np.array(gray)
-        binarized = (arr > v).astype(np.uint8) * 255
-        self.processed = Image.fromarray(binarized).convert('RGB')
-        self._redraw()
+        instrument.event('threshold')
+        if self.thresh_job is None:
+            self.thresh_job = self.root.after(FRAME_MS, self._flush_threshold)
+
+    def _flush_threshold(self):
+        self.thresh_job = None
+        if not self._ensure_original():
+            return
+        self._show_threshold(int(self.thresh_var.get()))
+
+    def _show_threshold(self, t):
+        parent, live = self._parent('threshold')
+        self._when_ready(parent, lambda base: self._threshold_on(base, parent, live, t))
+
+    def _threshold_on(self, base, parent, live, t):
+        self._cancel_render()
+        self.adaptive_live = False
+        self._gray(base)
+        chain = self._commit(parent + (('threshold', t),), live)
+        self.thresh_level = t
+        self.processed = self.history.lookup(chain)
+        self._draw_processed()
+        self._show_cache_stats()
 
     def threshold_otsu(self):
-        if self.original is None:
+        if not self._ensure_original():
             return
-        gray = ImageOps.grayscale(self.original)
-        t = otsu_threshold(gray)
+        instrument.event('otsu')
+        parent, live = self._parent('threshold')
+        self._when_ready(parent, lambda base: self._otsu_on(base, parent, live))
+
+    def _otsu_on(self, base, parent, live):
+        self._gray(base)
+        with span('otsu'):
+            t = otsu_from_histogram(self.gray_hist)
         self.thresh_var.set(t)
-        arr = np.array(gray)
-        binarized = (arr > t).astype(np.uint8) * 255
-        self.processed = Image.fromarray(binarized).convert('RGB')
-        self._redraw()
+        self._cancel_threshold()
+        self._threshold_on(base, parent, live, t)
+
+    def apply_adaptive(self):
+        if not self._ensure_original():
+            return
+        parent, live = self._parent('adaptive')
+        self._when_ready(parent, lambda base: self._adaptive_on(base, parent, live))
+
+    def _adaptive_on(self, base, parent, live):
+        self._cancel_threshold()
+        self._cancel_render()
+        self.thresh_level = None
+        if self.adaptive is None or self.adaptive[0] is not base:
+            gray = self._gray(base)
+            with span('integral images'):
+                self.adaptive = (base, AdaptiveThreshold(gray))
+        op = ('adaptive', self.method_var.get(), int(self.size_var.get()), round(float(self.k_var.get()), 2))
+        chain = self._commit(parent + (op,), live)
+        self.processed = self.history.lookup(chain)
+        if self.processed is None:
+            with span('adaptive', method=op[1], size=op[2]):
+                self.processed = self.adaptive[1].apply(*op[1:])
+            self.history.store(chain, self.processed)
+        self.adaptive_live = True
+        self._draw_processed()
+        self._show_cache_stats()
+
+    def _on_method_change(self, method):
+        self.k_var.set(DEFAULT_K[method])
+        self._on_adaptive_change(None)
+
+    def _on_adaptive_change(self, val):
+        # k, окно или метод поменялись, пока на экране локальный порог:
+        # пересчёт по готовым интегральным изображениям, раз в кадр
+        if not self.adaptive_live:
+            return
+        instrument.event('adaptive')
+        if self.adaptive_job is None:
+            self.adaptive_job = self.root.after(FRAME_MS, self._flush_adaptive)
+
+    def _flush_adaptive(self):
+        self.adaptive_job = None
+        if self.adaptive_live:
+            self.apply_adaptive()
+
+    def _processed_image(self):
+        if self.render is not None:
+            self._finish_render()
+        if self.processed is None and self.thresh_level is not None:
+            with span('threshold full'):
+                self.processed = self.gray.point(threshold_lut(self.thresh_level), '1')
+            self.history.store(self.history.chain, self.processed)
+        return self.processed
+
+    def undo(self, event=None):
+        instrument.event('undo')
+        self._step(self.history.undo() if self.history else None)
+
+    def redo(self, event=None):
+        instrument.event('redo')
+        self._step(self.history.redo() if self.history else None)
+
+    def _step(self, chain):
+        # Переход по истории: результат берётся из кэша
+        if chain is None:
+            return
+        self._cancel_threshold()
+        self._when_ready(chain, self._show_step)
+
+    def _show_step(self, img):
+        self._stop_live()
+        self.processed = img
+        self._draw_processed()
+        self._show_cache_stats()
 
     def reset(self):
-        if self.original is None:
+        if not self._ensure_original():
             return
-        self.processed = self.original.copy()
+        self._stop_live()
+        self._clear_threshold()
+        self.history.push(())
+        self.processed = self.original
         self.thresh_var.set(128)
-        self._redraw()
+        self._draw_processed()
+        self._show_cache_stats()
+
+    def _show_cache_stats(self):
+        st = self.op_cache.stats()
+        steps = len(self.history.chain) if self.history else 0
+        frames = f"{self.n_frames} frames, " if self.n_frames > 1 else ""
+        self.cache_label.config(text=f"{frames}steps {steps}, cache {st['items']} items, {st['bytes'] / 2**20:.0f} MB\n"
+                                     f"hits {st['hits']}, misses {st['misses']}")
 
     def save(self):
-        if self.processed is None:
+        if self.loading is not None:
+            self._ensure_original()
+        # Последнее действие ещё ждёт родительскую цепочку - сохраняется
+        # уже его результат
+        if self.pending is not None:
+            self._finish_pending()
+        if self.processed is None and self.render is None and self.thresh_level is None:
             return
-        path = filedialog.asksaveasfilename(defaultextension='.png', initialdir=self.last_dir, filetypes=[('PNG','*.png'),('JPEG','*.jpg;*.jpeg')], parent=self.root)
+        animated = self.n_frames > 1
+        path = filedialog.asksaveasfilename(defaultextension='.webp' if animated else '.png', initialdir=self.last_dir,
+                                            filetypes=[('PNG','*.png'),('JPEG','*.jpg;*.jpeg'),('WebP','*.webp'),('GIF','*.gif'),('TIFF','*.tif;*.tiff')], parent=self.root)
         if not path:
             return
+        if animated and stream_format(path) in STREAM_FORMATS:
+            self._save_animation(path)
+            return
+        # Сохраняется всегда полное разрешение, даже если на экране ещё proxy
+        img = self._processed_image()
+        if img is None:
+            return
+        # Маска пишется 1-битным PNG; в JPEG 1 бит не бывает
+        if img.mode == '1' and os.path.splitext(path)[1].lower() in ('.jpg', '.jpeg'):
+            img = img.convert('L')
+        try:
+            with span('save', file=os.path.basename(path)):
+                img.save(path)
+            self.last_dir = os.path.dirname(path)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+
+    def _save_animation(self, path):
+        # Все кадры через ту же цепочку операций, потоком в пуле процессов:
+        # в памяти только кадры в работе. Кодирование - в фоновом потоке
+        if self.saving is not None:
+            return
+        n, loop = frame_info(self.source_path)
+        frames = process_frames(iter_frames(self.source_path), run_chain, self.history.chain)
+        self.saving = self.saver.submit(save_frames, path, frames, n, loop=loop)
+        self.status.config(text=f"Saving {n} frames...")
+        self.root.after(RENDER_POLL_MS, self._poll_saving, path)
+
+    def _poll_saving(self, path):
+        if not self.saving.done():
+            self.root.after(RENDER_POLL_MS, self._poll_saving, path)
+            return
+        saving, self.saving = self.saving, None
+        self.status.config(text="")
         try:
-            self.processed.save(path)
+            saving.result()
             self.last_dir = os.path.dirname(path)
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
     def _fit_image_to_canvas(self, pil_img, canvas):
-        cw = canvas.winfo_width()
-        ch = canvas.winfo_height()
-        iw, ih = pil_img.size
-        scale_w = cw / iw
-        scale_h = ch / ih
-        scale = min(scale_w, scale_h, 1.0)  # никогда не превышаем размер холста
-        # Дополнительно: если изображение слишком маленькое, увеличим его минимум в 2 раза, но не больше холста
-        if iw * scale < cw * 0.5 or ih * scale < ch * 0.5:
-            scale = min(max(scale, 2.0), min(scale_w, scale_h))
-        nw = max(1, int(iw * scale))
-        nh = max(1, int(ih * scale))
-        return pil_img.resize((nw, nh), Image.LANCZOS)
+        size = fit_size(pil_img.width, pil_img.height, canvas.winfo_width(), canvas.winfo_height())
+        with span('fit to canvas'):
+            return self.display.get(pil_img, size)
 
+    def _on_resize(self, which):
+        # Во время перетаскивания окна - не чаще раза в RESIZE_MS на холст
+        instrument.event('resize')
+        if which not in self.resize_jobs:
+            self.resize_jobs[which] = self.root.after(RESIZE_MS, self._flush_resize, which)
+
+    def _flush_resize(self, which):
+        del self.resize_jobs[which]
+        if which == 'orig':
+            self._draw_original()
+        else:
+            self._draw_processed()
 
     def _redraw(self):
-        self.canvas_orig.delete('all')
-        self.canvas_proc.delete('all')
+        self._draw_original()
+        self._draw_processed()
+
+    def _draw_original(self):
+        img = self.loading.preview if self.loading is not None else self.original
+        disp = self._fit_image_to_canvas(img, self.canvas_orig) if img else None
+        self.photo_original = self._show('orig', self.canvas_orig, disp, self.photo_original)
 
-        if self.original:
-            disp = self._fit_image_to_canvas(self.original, self.canvas_orig)
-            self.photo_original = ImageTk.PhotoImage(disp)
-            cw = self.canvas_orig.winfo_width()
-            ch = self.canvas_orig.winfo_height()
-            self.canvas_orig.create_image(cw//2, ch//2, image=self.photo_original, anchor='center')
+    def _draw_processed(self):
+        if self.thresh_level is not None:
+            # Порог по LUT на уже уменьшенной серой копии
+            gray = self._gray_for_canvas()
+            with span('threshold preview'):
+                disp = gray.point(threshold_lut(self.thresh_level))
+        elif self.proxy is not None:
+            disp = self._fit_image_to_canvas(self.proxy, self.canvas_proc)
+        elif self.processed:
+            disp = self._fit_image_to_canvas(self.processed, self.canvas_proc)
+        elif self.loading is not None and self.loading.preview is not None:
+            disp = self._fit_image_to_canvas(self.loading.preview, self.canvas_proc)
+        else:
+            disp = None
+        self.photo_processed = self._show('proc', self.canvas_proc, disp, self.photo_processed)
 
-        if self.processed:
-            disp2 = self._fit_image_to_canvas(self.processed, self.canvas_proc)
-            self.photo_processed = ImageTk.PhotoImage(disp2)
-            cw = self.canvas_proc.winfo_width()
-            ch = self.canvas_proc.winfo_height()
-            self.canvas_proc.create_image(cw//2, ch//2, image=self.photo_processed, anchor='center')
+    def _show(self, which, canvas, disp, photo):
+        cw = canvas.winfo_width()
+        ch = canvas.winfo_height()
+        old = self.shown[which]
+        if old is not None and old[0] is disp and old[1:] == (cw, ch):
+            return photo
+        self.shown[which] = (disp, cw, ch)
+        canvas.delete('all')
+        if disp is None:
+            return None
+        with span('PhotoImage', size=f'{disp.width}x{disp.height}'):
+            photo = ImageTk.PhotoImage(disp)
+        canvas.create_image(cw//2, ch//2, image=photo, anchor='center')
+        instrument.painted(self.root)
+        return photo
 
 
 
 def main():
+    ap = argparse.ArgumentParser(prog='python -m lab2', description='Image filters and thresholding')
+    instrument.add_argument(ap)
+    args = ap.parse_args()
+    instrument.enable(args.trace)
     root = tk.Tk()
-    App(root)
+    # Предел кэша промежуточных результатов, МБ
+    mb = os.environ.get('LAB2_CACHE_MB')
+    App(root, int(mb) << 20 if mb else CACHE_BYTES)
+    instrument.overlay(tk, root)
     root.mainloop()
 
 
@@ -0,0 +1,129 @@
+import numpy as np
+from PIL import Image, ImageFilter
+
+# Ширина "строки" для медианы: полосы изображения ставятся рядом, чтобы
+# на одну итерацию цикла по строкам приходилось побольше пикселей
+MEDIAN_ROW_WIDTH = 1 << 14
+# До этого размера ядра сортировка PIL быстрее гистограмм (см. bench_filters.py)
+MEDIAN_PIL_MAX = 7
+
+PIL_FILTERS = {
+    'min': ImageFilter.MinFilter,
+    'median': ImageFilter.MedianFilter,
+    'max': ImageFilter.MaxFilter,
+}
+
+
+def _vhgw(a, size, op, axis):
+    # van Herk / Gil-Werman: префиксные и суффиксные экстремумы внутри блоков
+    # длины size, ответ - op(суффикс[i], префикс[i + size - 1]).
+    # Около трёх сравнений на пиксель при любом size.
+    r = size // 2
+    a = np.moveaxis(a, axis, 0)
+    n = a.shape[0]
+    total = -(-(n + 2*r) // size) * size
+    padded = np.pad(a, [(r, total - n - r)] + [(0, 0)] * (a.ndim - 1), mode='edge')
+    blocks = padded.reshape((total // size, size) + a.shape[1:])
+    prefix = op.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = op.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    return np.moveaxis(op(suffix[:n], prefix[size - 1:size - 1 + n]), 0, axis)
+
+
+def min_filter(arr, size):
+    return _vhgw(_vhgw(arr, size, np.minimum, 1), size, np.minimum, 0)
+
+
+def max_filter(arr, size):
+    return _vhgw(_vhgw(arr, size, np.maximum, 1), size, np.maximum, 0)
+
+
+def _window_sum(a, k):
+    # Скользящая сумма ширины k по оси 1 удвоением окна:
+    # s_2p[i] = s_p[i] + s_p[i + p], не больше 2*log2(k) сложений массивов
+    n = a.shape[1] - k + 1
+    out = None
+    off, p, s = 0, 1, a
+    while True:
+        if k & p:
+            part = s[:, off:off + n]
+            out = part.copy() if out is None else np.add(out, part, out=out)
+            off += p
+        if 2 * p > k:
+            return out
+        s = s[:, :-p] + s[:, p:]
+        p *= 2
+
+
+def median_filter(arr, size):
+    # Медиана по гистограммам (Huang, Perreault-Hébert): гистограммы столбцов
+    # окна обновляются на +-1 при сдвиге на строку вниз, гистограмма окна -
+    # их сумма по горизонтали. Поиск двухуровневый: сначала 16 грубых
+    # корзин (старшие 4 бита), потом 16 точных значений внутри найденной.
+    arr = np.asarray(arr, dtype=np.uint8)
+    r = size // 2
+    rank = size * size // 2
+    h, w = arr.shape
+    wp = w + 2*r
+    # полоса не короче 4*size строк, иначе начальное заполнение дороже самой полосы
+    strips = max(1, min(h // (4*size), MEDIAN_ROW_WIDTH // wp))
+    rows = -(-h // strips)
+    padded = np.pad(arr, ((r, r + strips*rows - h), (r, r)), mode='edge')
+    wide = np.concatenate([padded[s*rows:s*rows + rows + 2*r] for s in range(strips)], axis=1)
+    width = wide.shape[1]
+    wo = width - size + 1
+    cols = np.arange(width)
+    xs = np.arange(wo)
+
+    fine = np.zeros((256, width), dtype=np.uint16)
+    coarse = np.zeros((16, width), dtype=np.uint16)
+    for j in range(size):
+        fine[wide[j], cols] += 1
+        coarse[wide[j] >> 4, cols] += 1
+
+    out = np.empty((rows, wo), dtype=np.uint8)
+    for y in range(rows):
+        if y:
+            old, new = wide[y - 1], wide[y + size - 1]
+            fine[old, cols] -= 1
+            fine[new, cols] += 1
+            coarse[old >> 4, cols] -= 1
+            coarse[new >> 4, cols] += 1
+
+        kc = _window_sum(coarse, size)
+        acc = np.zeros(wo, dtype=np.uint16)
+        below = np.zeros(wo, dtype=np.uint16)
+        b = np.zeros(wo, dtype=np.uint16)
+        for c in range(16):
+            acc += kc[c]
+            passed = acc <= rank
+            b += passed
+            np.copyto(below, acc, where=passed)
+
+        kf = _window_sum(fine, size).ravel()
+        base = (b * 16).astype(np.intp) * wo + xs
+        res = b * 16
+        for t in range(15):
+            below += kf[base + t * wo]
+            res += below <= rank
+        out[y] = res
+
+    result = np.concatenate([out[:, s*wp:s*wp + w] for s in range(strips)], axis=0)
+    return result[:h]
+
+
+PLANE_FILTERS = {'min': min_filter, 'median': median_filter, 'max': max_filter}
+
+
+def rank_filter(image, kind, size):
+    # Тот же результат, что image.filter(ImageFilter.<Kind>Filter(size)):
+    # края дополняются повтором крайних пикселей, каналы - по отдельности
+    if size < 1 or size % 2 == 0:
+        raise ValueError('bad filter size')
+    if image.mode == '1':
+        # Маска хранится в PIL байтом 0/255 - считаем как L и возвращаем в 1 бит
+        return rank_filter(image.convert('L'), kind, size).convert('1', dither=Image.Dither.NONE)
+    if image.mode not in ('L', 'RGB', 'RGBA', 'CMYK', 'LA') or (kind == 'median' and size <= MEDIAN_PIL_MAX):
+        return image.filter(PIL_FILTERS[kind](size))
+    func = PLANE_FILTERS[kind]
+    bands = [Image.fromarray(func(np.asarray(band), size)) for band in image.split()]
+    return bands[0] if len(bands) == 1 else Image.merge(image.mode, bands)
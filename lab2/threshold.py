@@ -0,0 +1,112 @@
+import numpy as np
+from PIL import Image, ImageOps
+
+
+def threshold_lut(t):
+    # 255 для яркостей > t, иначе 0 - для Image.point
+    return [0] * (t + 1) + [255] * (255 - t)
+
+
+def otsu_threshold(grayscale_image, hist=None):
+    # hist - уже посчитанная гистограмма из 256 корзин, тогда по пикселям
+    # второй раз не проходим
+    if hist is None:
+        hist = gray_histogram(grayscale_image)
+    return otsu_from_histogram(hist)
+
+
+def gray_histogram(grayscale_image):
+    # Цветное сначала переводится в L: первые 256 корзин гистограммы
+    # RGB - это только красный канал
+    if not hasattr(grayscale_image, 'histogram'):
+        arr = np.asarray(grayscale_image, dtype=np.uint8)
+        if arr.ndim == 2:
+            return np.bincount(arr.ravel(), minlength=256)
+        grayscale_image = Image.fromarray(arr)
+    if grayscale_image.mode != 'L':
+        grayscale_image = ImageOps.grayscale(grayscale_image)
+    return np.array(grayscale_image.histogram())
+
+
+def otsu_from_histogram(hist):
+    return int(otsu_batch(np.asarray(hist)[None])[0])
+
+
+def otsu_batch(hists):
+    # Порог Оцу для каждой строки (n, 256) разом. Те же операции и в том же
+    # порядке, что в последовательном проходе по корзинам: накопленные
+    # суммы целых в float64 точны, поэтому результат совпадает бит в бит.
+    # Из равных максимумов берётся первый, порог 0 - если все var <= 0.
+    hists = np.asarray(hists)
+    i = np.arange(hists.shape[-1])
+    total = hists.sum(axis=-1, keepdims=True)
+    sum_total = (i * hists).sum(axis=-1, keepdims=True)
+    weight_bg = np.cumsum(hists, axis=-1, dtype=np.float64)
+    sum_bg = np.cumsum(i * hists, axis=-1, dtype=np.float64)
+    weight_fg = total - weight_bg
+    valid = (weight_bg > 0) & (weight_fg > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_total - sum_bg) / weight_fg
+        var_between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    var_between = np.where(valid, var_between, 0.0)
+    best = np.argmax(var_between, axis=-1)
+    return np.where(np.take_along_axis(var_between, best[:, None], axis=-1)[:, 0] > 0, best, 0)
+
+
+def multi_otsu(hist, levels=2):
+    # levels порогов (levels + 1 класс) по максимуму межклассовой дисперсии,
+    # т.е. суммы w_k * mu_k^2 по классам. Класс k - яркости (t[k-1], t[k]].
+    # Динамика по накопленным таблицам: best[k][j] - лучшая сумма для
+    # первых j корзин, разбитых на k + 1 непустых классов.
+    # Непустых яркостей меньше, чем классов - порогов столько, сколько
+    # получится, а при одной яркости - обычный порог Оцу
+    hist = np.asarray(hist, dtype=np.float64)
+    levels = min(levels, int(np.count_nonzero(hist)) - 1)
+    if levels < 1:
+        return [otsu_from_histogram(hist)]
+    n = hist.size
+    w = np.concatenate([[0.0], np.cumsum(hist)])
+    s = np.concatenate([[0.0], np.cumsum(np.arange(n) * hist)])
+    # cost[a, b] - вклад класса из корзин a..b-1
+    dw = w[None, :] - w[:, None]
+    ds = s[None, :] - s[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cost = np.where(dw > 0, ds * ds / dw, -np.inf)
+    best = cost[0].copy()
+    choice = []
+    for _ in range(levels):
+        cand = best[:, None] + cost
+        arg = np.argmax(cand, axis=0)
+        choice.append(arg)
+        best = cand[arg, np.arange(n + 1)]
+    cuts, j = [], n
+    for arg in reversed(choice):
+        j = int(arg[j])
+        cuts.append(j - 1)
+    return cuts[::-1]
+
+
+def levels_lut(thresholds):
+    # Классы multi_otsu -> равномерно распределённые уровни серого
+    out, k = [], 0
+    step = 255 / len(thresholds)
+    for v in range(256):
+        while k < len(thresholds) and v > thresholds[k]:
+            k += 1
+        out.append(round(k * step))
+    return out
+
+
+def binarize(image, t):
+    return ImageOps.grayscale(image).point(threshold_lut(t), '1')
+
+
+def pack_mask(image):
+    # Маска '1' -> биты NumPy (1/8 байта на пиксель) для хранения
+    return np.packbits(np.asarray(image), axis=-1), image.size
+
+
+def unpack_mask(packed):
+    bits, (w, h) = packed
+    return Image.fromarray(np.unpackbits(bits, axis=-1, count=w).view(bool))
@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+import numpy as np
+from PIL import Image
+from rank_filters import rank_filter
+from threshold import binarize
+
+TILE = 1024
+# Меньше этого выгоднее считать целиком в текущем процессе
+TILED_MIN_PIXELS = 8_000_000
+TILED_MODES = ('L', 'RGB', 'RGBA', 'CMYK')
+# Размер полосы, когда фильтр в этом же процессе надо уметь прервать
+STRIP_PIXELS = 500_000
+
+_pools = {}
+# Пул запускается и из фонового потока GUI: fork многопоточного процесса
+# с интерпретатором Tcl унаследовал бы захваченные блокировки. Процессы
+# порождает чистый forkserver (на Windows его нет - там spawn)
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def get_pool(workers):
+    # Пулы живут до конца программы, чтобы не платить за запуск процессов
+    # на каждый вызов
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(START_METHOD))
+    return pool
+
+
+def tile_grid(h, w, tile=TILE):
+    return [(y, min(y + tile, h), x, min(x + tile, w))
+            for y in range(0, h, tile) for x in range(0, w, tile)]
+
+
+def _process_block(block, op, arg):
+    if op == 'threshold':
+        return binarize(block, arg)
+    return rank_filter(block, op, arg)
+
+
+def _run_tile(job):
+    # Выполняется в процессе пула: читает тайл с ореолом из общей памяти
+    # и пишет в общий выходной буфер только его внутреннюю часть
+    src_name, dst_name, shape, out_shape, mode, op, arg, r, (y0, y1, x0, x1) = job
+    src_shm = shared_memory.SharedMemory(name=src_name)
+    dst_shm = shared_memory.SharedMemory(name=dst_name)
+    try:
+        src = np.ndarray(shape, dtype=np.uint8, buffer=src_shm.buf)
+        dst = np.ndarray(out_shape, dtype=np.uint8, buffer=dst_shm.buf)
+        h, w = shape[:2]
+        ty0, tx0 = max(0, y0 - r), max(0, x0 - r)
+        ty1, tx1 = min(h, y1 + r), min(w, x1 + r)
+        block = Image.frombytes(mode, (tx1 - tx0, ty1 - ty0), np.ascontiguousarray(src[ty0:ty1, tx0:tx1]))
+        res = _process_block(block, op, arg)
+        res = np.asarray(res.convert('L') if res.mode == '1' else res).reshape(ty1 - ty0, tx1 - tx0, -1)
+        dst[y0:y1, x0:x1] = res[y0 - ty0:y1 - ty0, x0 - tx0:x1 - tx0]
+    finally:
+        src_shm.close()
+        dst_shm.close()
+
+
+def check(cancel):
+    if cancel is not None and cancel.is_set():
+        raise CancelledError()
+
+
+def run_tiled(image, op, arg, workers=None, tile=TILE, cancel=None):
+    # op: 'min' / 'median' / 'max' (arg - размер ядра) или 'threshold'
+    # (arg - порог, результат в режиме L). Ореол тайла равен радиусу ядра,
+    # поэтому склейка совпадает с обработкой целиком бит в бит.
+    # cancel (threading.Event) проверяется между тайлами
+    if image.mode not in TILED_MODES:
+        raise ValueError(f'unsupported mode {image.mode}')
+    workers = workers or cpu_count()
+    w, h = image.size
+    bands = len(image.getbands())
+    out_bands, out_mode = (1, 'L') if op == 'threshold' else (bands, image.mode)
+    r = 0 if op == 'threshold' else arg // 2
+    shape, out_shape = (h, w, bands), (h, w, out_bands)
+
+    src_shm = shared_memory.SharedMemory(create=True, size=h * w * bands)
+    dst_shm = shared_memory.SharedMemory(create=True, size=h * w * out_bands)
+    try:
+        np.ndarray(shape, dtype=np.uint8, buffer=src_shm.buf)[:] = np.asarray(image).reshape(shape)
+        jobs = [(src_shm.name, dst_shm.name, shape, out_shape, image.mode, op, arg, r, box)
+                for box in tile_grid(h, w, tile)]
+        if workers == 1:
+            for job in jobs:
+                check(cancel)
+                _run_tile(job)
+        else:
+            # В работе не больше workers тайлов: после отмены ждать
+            # приходится только их
+            pool = get_pool(workers)
+            running = set()
+            try:
+                for job in jobs:
+                    if len(running) >= workers:
+                        done, running = wait(running, return_when=FIRST_COMPLETED)
+                        for fut in done:
+                            fut.result()
+                    check(cancel)
+                    running.add(pool.submit(_run_tile, job))
+                for fut in running:
+                    fut.result()
+            finally:
+                # Запущенные тайлы дописываются до освобождения общей памяти
+                wait(running)
+        out = Image.frombytes(out_mode, (w, h), np.ndarray(out_shape, dtype=np.uint8, buffer=dst_shm.buf).copy())
+        # Порог собирается в L 0/255, наружу - маской '1', как у binarize
+        return out.convert('1', dither=Image.Dither.NONE) if op == 'threshold' else out
+    finally:
+        for shm in (src_shm, dst_shm):
+            shm.close()
+            shm.unlink()
+
+
+def run_strips(image, kind, size, cancel, rows=None):
+    # В этом же процессе, горизонтальными полосами с ореолом в радиус
+    # ядра: результат тот же, что целиком, а между полосами - проверка отмены
+    w, h = image.size
+    rows = rows or max(1, STRIP_PIXELS // w)
+    r = size // 2
+    out = None
+    for y0 in range(0, h, rows):
+        check(cancel)
+        y1 = min(y0 + rows, h)
+        ty0, ty1 = max(0, y0 - r), min(h, y1 + r)
+        res = rank_filter(image.crop((0, ty0, w, ty1)), kind, size)
+        if out is None:
+            out = Image.new(res.mode, (w, h))
+        out.paste(res.crop((0, y0 - ty0, w, y1 - ty0)), (0, y0))
+    return out
+
+
+def filter_image(image, kind, size, workers=None, cancel=None):
+    # Для больших изображений - тайлы на всех ядрах, иначе целиком.
+    # С cancel фильтр можно прервать между тайлами или полосами
+    workers = workers or cpu_count()
+    pixels = image.width * image.height
+    if workers > 1 and pixels >= TILED_MIN_PIXELS and image.mode in TILED_MODES:
+        return run_tiled(image, kind, size, workers, cancel=cancel)
+    if cancel is not None and pixels > STRIP_PIXELS:
+        return run_strips(image, kind, size, cancel)
+    return rank_filter(image, kind, size)